@@ -0,0 +1,364 @@
+"""
+Interface comum para os modelos avaliados no BeSIM.
+
+Cada backend implementa `answer(video, questions)`, que recebe a linha do
+vídeo na tabela (com `id`, `path` e `hash` do arquivo local) e o dicionário de
+perguntas desse vídeo, e devolve {question_id: resposta bruta}. Os
+backends são registrados por nome com `register_backend` e criados com
+`get_backend`; as dependências de cada modelo só são importadas quando o
+backend é instanciado.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import scheduler
+import utils
+
+BACKENDS = {}
+
+
+def register_backend(name: str):
+    def decorator(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return decorator
+
+
+def get_backend(name: str, **options):
+    if name not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: '{name}'. Disponíveis: {', '.join(sorted(BACKENDS))}.")
+    return BACKENDS[name](**options)
+
+
+class Backend:
+    name = None
+
+    def __init__(self, model: str, max_requests: int = 4, limiter=None, retry=None):
+        self.model = model
+        self.max_requests = max_requests
+        self.limiter = limiter
+        self.retry = retry or scheduler.RetryPolicy()
+        # Latência de cada pergunta respondida em `_map_questions`, por ID.
+        self.latencies = {}
+        self._semaphore = None
+
+    @property
+    def config(self) -> dict:
+        """Parâmetros que mudam as respostas e entram na chave do cache."""
+        return {}
+
+    async def answer(self, video: dict, questions: dict) -> dict:
+        raise NotImplementedError
+
+    def prefetch(self, videos: list):
+        """Avisa quais vídeos serão respondidos, na ordem; por padrão não faz nada."""
+
+    async def answer_budget(self, video: dict, questions: dict, budget: int, latencies: dict, budgets=()) -> dict:
+        """Responde usando `budget` frames; só os backends com --frame-budgets implementam."""
+        raise NotImplementedError(f"O backend '{self.name}' não suporta a varredura de frames.")
+
+    def close(self):
+        pass
+
+    def _limit(self) -> asyncio.Semaphore:
+        # Criado sob demanda para pertencer ao loop que está rodando.
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_requests)
+        return self._semaphore
+
+    def _acquire(self, prompt: str, seconds: float | None = None):
+        if self.limiter:
+            self.limiter.acquire(scheduler.estimate_tokens(prompt, seconds))
+
+    async def _map_questions(self, ask, questions: dict, latencies: dict | None = None) -> dict:
+        """Executa `ask(question_text)` para cada pergunta, em paralelo e limitado."""
+        latencies = self.latencies if latencies is None else latencies
+
+        async def one(question_id, question):
+            async with self._limit():
+                inicio = time.perf_counter()
+                response = await asyncio.to_thread(ask, utils.createQuestion(question))
+                latencies[question_id] = time.perf_counter() - inicio
+                return question_id, response
+
+        return dict(await asyncio.gather(*(one(qid, q) for qid, q in questions.items())))
+
+
+@register_backend("gemini")
+class GeminiBackend(Backend):
+    def __init__(self, model="gemini-1.5-pro", batch=False, local=False, proxy=False, **options):
+        super().__init__(model, **options)
+        import gemini
+        from gemini_local import LocalGeminiClient
+
+        self.gemini = gemini
+        self.batch = batch
+        self.local = local
+        self.proxy_profile = "gemini" if proxy else None
+        # Mesmo registro de uploads do gemini.py: vídeos ainda ativos na API não são reenviados.
+        ids_file = "log/uploaded_video_ids_gemini_proxy.json" if proxy else "log/uploaded_video_ids_gemini.json"
+        self.ids_file = gemini.local_path(ids_file) if local else ids_file
+        self.uploaded = gemini.loadUploadedVideoIds(self.ids_file)
+        self.ids_lock = threading.Lock()
+        if local:
+            self.client = LocalGeminiClient()
+        else:
+            from dotenv import load_dotenv
+            from google import genai
+
+            load_dotenv()
+            self.client = genai.Client(api_key=os.getenv("API_GOOGLE"))
+
+    @property
+    def config(self) -> dict:
+        config = {"batch": True} if self.batch else {}
+        if self.proxy_profile:
+            config["proxy"] = self.proxy_profile
+        # Respostas do cliente local (falsas) não podem ser servidas a uma execução real.
+        if self.local:
+            config["local"] = True
+        return config
+
+    async def answer(self, video, questions):
+        stored_name = self.uploaded.get(str(video["id"]))
+        media = await asyncio.to_thread(
+            self.gemini.get_or_upload_video, video["path"], self.client, stored_name, self.proxy_profile
+        )
+        if media is None:
+            return {}
+        if media.name != stored_name:
+            with self.ids_lock:
+                self.uploaded[str(video["id"])] = media.name
+                self.gemini.saveUploadedVideoIds(self.uploaded, self.ids_file)
+        seconds = self.gemini.video_duration(video)
+        if self.batch:
+            async with self._limit():
+                return await asyncio.to_thread(
+                    self.gemini.ask_video_batch, questions, media, self.model, self.client, self.limiter, seconds, self.retry
+                )
+
+        def ask(question_text):
+            tokens = scheduler.estimate_tokens(question_text, seconds)
+            return self.gemini.callApi(media, question_text, self.model, self.client, self.limiter, tokens, retry=self.retry)
+
+        return await self._map_questions(ask, questions)
+
+
+@register_backend("qwen")
+class QwenBackend(Backend):
+    def __init__(self, model="qwen-vl-max-latest", proxy=False, **options):
+        super().__init__(model, **options)
+        import qwen
+        import qwen2
+
+        self.qwen = qwen
+        self.qwen2 = qwen2
+        self.proxy_profile = "qwen" if proxy else None
+
+    @property
+    def config(self) -> dict:
+        return {"proxy": self.proxy_profile} if self.proxy_profile else {}
+
+    async def answer(self, video, questions):
+        encoded = await asyncio.to_thread(self.qwen2.encode_video, video["path"], self.proxy_profile)
+        url = f"data:video/mp4;base64,{encoded}"
+
+        def ask(question_text):
+            self._acquire(question_text)
+            # Erros voltam para a política de retentativas em vez de virar resposta.
+            return self.retry.call(self.qwen.call_api, url, question_text, model_id=self.model)
+
+        return await self._map_questions(ask, questions)
+
+
+@register_backend("gpt")
+class GptBackend(Backend):
+    def __init__(self, model="gpt-4.1-mini", max_frames=None, frame_height=None, jpeg_quality=None, sampling="uniform",
+                 **options):
+        super().__init__(model, **options)
+        import gpt
+
+        self.gpt = gpt
+        self.max_frames = max_frames or gpt.MAX_FRAMES
+        self.frame_height = frame_height or gpt.FRAME_STORE_HEIGHT
+        self.jpeg_quality = jpeg_quality or gpt.JPEG_QUALITY
+        self.sampling = sampling
+        self.client = gpt.create_client()
+
+    @property
+    def config(self) -> dict:
+        config = {"max_frames": self.max_frames, "frame_height": self.frame_height, "jpeg_quality": self.jpeg_quality}
+        # Só entra na chave do cache quando muda os frames enviados.
+        if self.sampling != "uniform":
+            config["sampling"] = self.sampling
+        return config
+
+    async def answer(self, video, questions):
+        frames = await asyncio.to_thread(
+            self.gpt.load_frames, video["path"], self.max_frames, self.frame_height, self.jpeg_quality,
+            sampling=self.sampling,
+        )
+
+        def ask(question_text):
+            self._acquire(question_text)
+            return self.retry.call(self.gpt.ask, frames, question_text, self.client, self.model)
+
+        return await self._map_questions(ask, questions)
+
+
+@register_backend("llava")
+class LlavaBackend(Backend):
+    def __init__(self, model="lmms-lab/LLaVA-Video-7B-Qwen2", max_frames=64, sampling="uniform", server=None,
+                 prefix_cache=False, prefetch=0, decoder_threads=None, **options):
+        """
+        Com `server` ("host:porta"), as perguntas vão para o llava_server.py,
+        que já tem o modelo carregado e agrupa as perguntas simultâneas em
+        lotes; `model` deve ser o checkpoint carregado pelo servidor. Com
+        `prefix_cache`, o prefill dos frames é feito uma vez por chamada e
+        reaproveitado pelas perguntas dela; só um prefixo fica na GPU por vez. Com `prefetch` > 0, até esse
+        número de vídeos seguintes é decodificado em segundo plano.
+        """
+        if server is None:
+            # O modelo local atende uma pergunta por vez.
+            options["max_requests"] = 1
+        super().__init__(model, **options)
+        self.max_frames = max_frames
+        self.sampling = sampling
+        self.client = None
+        self.prefetcher = None
+        # Amostras da varredura de frames, compartilhadas entre os budgets de um vídeo.
+        self.sweeps = OrderedDict()
+        if server is not None:
+            from llava_server import LlavaClient
+
+            self.client = LlavaClient(server)
+            return
+        import llava_video
+
+        self.llava = llava_video
+        self.prefix_cache = prefix_cache
+        self._prefix_slot = None
+        self.tokenizer, self.llm, self.image_processor = llava_video.load_model(model)
+        self.decoder_threads = decoder_threads or llava_video.frame_sampler.DECODER_THREADS
+        if prefetch:
+            self.prefetcher = llava_video.VideoPrefetcher(
+                self.image_processor, max_frames, sampling=sampling, depth=prefetch, decoder_threads=self.decoder_threads
+            )
+
+    @property
+    def config(self) -> dict:
+        config = {"max_frames": self.max_frames}
+        if self.sampling != "uniform":
+            config["sampling"] = self.sampling
+        return config
+
+    def prefetch(self, videos):
+        if self.prefetcher is not None:
+            self.prefetcher.start(video["path"] for video in videos)
+
+    def close(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+    def _prepare(self, video):
+        if self.prefetcher is not None:
+            return self.prefetcher.get(video["path"])
+        return self.llava.prepare_video(
+            video["path"], self.image_processor, self.max_frames, sampling=self.sampling, decoder_threads=self.decoder_threads
+        )
+
+    async def answer(self, video, questions):
+        if self.client is not None:
+            def ask(question_text):
+                return self.client.ask(video["path"], question_text, self.max_frames, self.sampling)
+
+            return await self._map_questions(ask, questions)
+
+        if self.prefix_cache:
+            video_tensor, time_instruciton = await asyncio.to_thread(self._prepare, video)
+            # Os past_key_values de um vídeo ocupam a GPU até a última pergunta
+            # dele: um vídeo por vez, decodificado antes de esperar a vez.
+            if self._prefix_slot is None:
+                self._prefix_slot = asyncio.Semaphore(1)
+            async with self._prefix_slot:
+                # O prefill passa pelo modelo: respeita o limite de uma chamada por vez.
+                async with self._limit():
+                    prefix = await asyncio.to_thread(
+                        self.llava.prepare_prefix, self.tokenizer, self.llm, video_tensor, time_instruciton
+                    )
+                del video_tensor
+
+                def ask(question_text):
+                    return self.llava.generate_with_prefix(self.tokenizer, self.llm, prefix, question_text)
+
+                return await self._map_questions(ask, questions)
+
+        video_tensor, time_instruciton = await asyncio.to_thread(self._prepare, video)
+
+        def ask(question_text):
+            return self.llava.generate(self.tokenizer, self.llm, video_tensor, time_instruciton, question_text)
+
+        return await self._map_questions(ask, questions)
+
+    async def _sweep(self, video, budgets):
+        """
+        Decodifica o vídeo uma vez para todos os budgets da varredura. A
+        entrada sai do cache quando todos os budgets a usaram (ou por LRU,
+        se algum budget não precisar do vídeo).
+        """
+        entry = self.sweeps.get(video["hash"])
+        if entry is None:
+            task = asyncio.ensure_future(asyncio.to_thread(
+                self.llava.decode_video_budgets, video["path"], self.image_processor, budgets, self.decoder_threads
+            ))
+            entry = self.sweeps[video["hash"]] = {"task": task, "users": len(budgets)}
+            while len(self.sweeps) > 8:
+                self.sweeps.popitem(last=False)
+        entry["users"] -= 1
+        if entry["users"] == 0:
+            self.sweeps.pop(video["hash"], None)
+        return await entry["task"]
+
+    async def answer_budget(self, video, questions, budget, latencies, budgets=()):
+        if self.client is not None:
+            raise NotImplementedError("A varredura de frames precisa do modelo local (sem --llava-server).")
+        prepared = await self._sweep(video, budgets or (budget,))
+        pixels, time_instruciton = prepared[budget]
+        video_tensor = [pixels.to(self.llava.device)]
+
+        def ask(question_text):
+            return self.llava.generate(self.tokenizer, self.llm, video_tensor, time_instruciton, question_text)
+
+        return await self._map_questions(ask, questions, latencies)
+
+
+class FrameBudget(Backend):
+    """
+    Um budget da varredura de frames (runner --frame-budgets): o backend
+    interno com `max_frames` fixo. Os budgets de um mesmo vídeo partem da
+    mesma amostra uniforme, a do maior budget.
+    """
+
+    def __init__(self, inner: Backend, budget: int, budgets: list):
+        super().__init__(inner.model, inner.max_requests, inner.limiter, inner.retry)
+        self.name = inner.name
+        self.inner = inner
+        self.budget = budget
+        self.budgets = sorted(budgets)
+
+    @property
+    def config(self) -> dict:
+        config = {**self.inner.config, "max_frames": self.budget}
+        # Os frames de um budget menor são um subconjunto dos do maior e não
+        # os mesmos de uma execução isolada com esse budget.
+        if self.budget < self.budgets[-1]:
+            config["subset_of"] = self.budgets[-1]
+        return config
+
+    async def answer(self, video, questions):
+        return await self.inner.answer_budget(video, questions, self.budget, self.latencies, self.budgets)
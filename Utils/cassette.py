@@ -0,0 +1,149 @@
+"""
+Gravação e reprodução ("cassete") das chamadas aos modelos.
+
+`RecordingBackend` envolve qualquer backend e grava cada par pergunta/
+resposta com a latência observada. `ReplayBackend` (registrado como
+"replay") devolve essas respostas sem rede e, opcionalmente, simula a
+latência gravada. Com isso o escalonador, o cache e o processamento das
+respostas podem ser medidos offline e execuções antigas podem ser
+reavaliadas de forma reproduzível.
+
+Uso:
+    python runner.py --backend gemini --record cache/cassette_gemini.jsonl
+    python runner.py --backend replay --cassette cache/cassette_gemini.jsonl --model gemini-1.5-pro --latency-scale 1
+    python runner.py --backend replay --cassette cache/cassette_llava.jsonl --model lmms-lab/LLaVA-Video-7B-Qwen2 --replay-config '{"max_frames": 8}'
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+
+import utils
+from backends import Backend, register_backend
+from response_cache import ResponseCache
+
+
+class Cassette:
+    """Arquivo JSONL com as interações gravadas, indexadas por modelo, vídeo, prompt e configuração."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["key"]] = entry
+
+    @staticmethod
+    def make_key(model: str, video_hash: str, prompt: str, config: dict | None = None) -> str:
+        # A configuração (max_frames, batch, proxy, sampling...) separa gravações do mesmo modelo.
+        return ResponseCache.make_key(model, video_hash, prompt, config)
+
+    def get(self, key: str) -> dict | None:
+        return self.entries.get(key)
+
+    def record(self, key: str, **fields):
+        entry = {"key": key, **fields}
+        with self.lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+                file.flush()
+            self.entries[key] = entry
+
+
+class RecordingBackend(Backend):
+    """Repassa as chamadas para `inner` e grava cada resposta no cassete."""
+
+    def __init__(self, inner: Backend, path: str):
+        super().__init__(inner.model, inner.max_requests, inner.limiter, inner.retry)
+        self.inner = inner
+        self.name = inner.name
+        self.cassette = Cassette(path)
+
+    @property
+    def config(self) -> dict:
+        return self.inner.config
+
+    async def answer(self, video, questions):
+        inicio = time.perf_counter()
+        result = await self.inner.answer(video, questions)
+        elapsed = time.perf_counter() - inicio
+        group = f"{video['hash']}:{inicio}"
+
+        for question_id, response in result.items():
+            prompt = utils.createQuestion(questions[question_id])
+            # Sem latência por pergunta (ex.: modo em lote), as respostas do
+            # vídeo compartilham a latência da chamada única.
+            latency = self.inner.latencies.pop(question_id, None)
+            if latency is not None:
+                self.latencies[question_id] = latency
+            self.cassette.record(
+                Cassette.make_key(self.model, video["hash"], prompt, self.config),
+                backend=self.name,
+                model=self.model,
+                config=self.config,
+                video_id=video["id"],
+                question_id=question_id,
+                response=response,
+                latency=elapsed if latency is None else latency,
+                group=group if latency is None else None,
+                recorded_at=time.time(),
+            )
+        return result
+
+    def prefetch(self, videos):
+        self.inner.prefetch(videos)
+
+    def close(self):
+        self.inner.close()
+
+
+@register_backend("replay")
+class ReplayBackend(Backend):
+    """
+    Reproduz as respostas de um cassete. Com `latency_scale` > 0, cada
+    resposta espera a latência gravada multiplicada pelo fator (respostas
+    gravadas em uma única chamada esperam uma só vez). `config` escolhe
+    qual gravação usar: o `config` do backend gravado (ex: {"max_frames": 8}).
+    """
+
+    def __init__(self, cassette: str, model: str = "replay", latency_scale: float = 0.0, config: dict | None = None,
+                 **options):
+        super().__init__(model, **options)
+        self.cassette = Cassette(cassette)
+        self.latency_scale = latency_scale
+        self.recorded_config = config or {}
+
+    @property
+    def config(self) -> dict:
+        return self.recorded_config
+
+    async def answer(self, video, questions):
+        groups = {}
+        for question_id, question in questions.items():
+            entry = self.cassette.get(
+                Cassette.make_key(self.model, video["hash"], utils.createQuestion(question), self.recorded_config)
+            )
+            if entry is None:
+                print(f"Pergunta {question_id} não encontrada no cassete. Pulando...")
+                continue
+            groups.setdefault(entry.get("group") or question_id, []).append((question_id, entry))
+
+        async def replay(entries):
+            if self.latency_scale:
+                async with self._limit():
+                    await asyncio.sleep(max(entry["latency"] for _, entry in entries) * self.latency_scale)
+            return [(question_id, entry["response"]) for question_id, entry in entries]
+
+        replies = await asyncio.gather(*(replay(entries) for entries in groups.values()))
+        return {question_id: response for group in replies for question_id, response in group}
@@ -1,10 +1,85 @@
 # batch_processor.py
 import argparse
+import json
 import pandas as pd
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
+
+def last_line(text: str) -> str:
+    lines = [line for line in text.strip().split('\n') if line.strip()]
+    return lines[-1] if lines else ''
+
+
+def run_stage(command: list, log_path: Path) -> tuple[bool, str]:
+    """
+    Executa uma etapa de um vídeo, anexando o comando e toda a saída ao log
+    do vídeo. Devolve (sucesso, última linha da saída) sem lançar exceções,
+    para que a falha de um vídeo não interrompa os outros.
+    """
+    with open(log_path, 'a', encoding='utf-8') as log:
+        log.write(f"$ {' '.join(command)}\n")
+        log.flush()
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, encoding='utf-8')
+        except OSError as e:
+            log.write(f"{e}\n")
+            return False, str(e)
+        log.write(result.stdout)
+        log.write(result.stderr)
+        log.write(f"[código de saída: {result.returncode}]\n\n")
+    # O logging do yt_cutter.py vai para o stderr.
+    output = result.stdout if result.returncode == 0 and result.stdout.strip() else result.stderr
+    return result.returncode == 0, last_line(output)
+
+
+def staged_url(staged_file: Path) -> str | None:
+    """URL registrada junto a um download em staging, se ele estiver completo."""
+    info_path = Path(f"{staged_file}.json")
+    if not (staged_file.exists() and info_path.exists()):
+        return None
+    try:
+        return json.loads(info_path.read_text(encoding='utf-8')).get('url')
+    except (OSError, ValueError):
+        return None
+
+
+def download_stage(job: dict) -> tuple[bool, str]:
+    """Etapa de rede: baixa o vídeo inteiro para a pasta de staging."""
+    # Um download completo de uma execução anterior (ex: corte que falhou) é
+    # reaproveitado, desde que seja da mesma URL (a planilha pode ter mudado).
+    if staged_url(job['staged_file']) == str(job['url']):
+        return True, 'Download reaproveitado da execução anterior.'
+    return run_stage(job['download_command'], job['log_path'])
+
+
+def cut_stage(job: dict) -> tuple[bool, str]:
+    """Etapa de CPU: corta (ou só move) o vídeo baixado e registra os metadados."""
+    ok, details = run_stage(job['cut_command'], job['log_path'])
+    if ok:
+        for staged in (job['staged_file'], Path(f"{job['staged_file']}.json")):
+            staged.unlink(missing_ok=True)
+    return ok, details
+
+
+def merge_metadata_logs(jobs: list, log_file: Path):
+    """
+    Junta, na ordem do arquivo de entrada, os logs de metadados que cada
+    vídeo gravou separadamente (evita escritas simultâneas na mesma planilha).
+    """
+    parts = [pd.read_excel(job['metadata_log'], engine='openpyxl') for job in jobs if job['metadata_log'].exists()]
+    if not parts:
+        return
+    if log_file.exists():
+        parts.insert(0, pd.read_excel(log_file, engine='openpyxl'))
+    pd.concat(parts, ignore_index=True).to_excel(log_file, index=False, engine='openpyxl')
+    for job in jobs:
+        job['metadata_log'].unlink(missing_ok=True)
+
+
 def main():
     """
     Função principal para analisar argumentos e rodar o processamento em lote.
@@ -17,6 +92,13 @@ Exemplo de Uso:
   # Usando um arquivo Excel
   python batch_processor.py "caminho/para/sua/lista_videos.xlsx" --output-path "./videos_baixados"
 
+  # 8 downloads e 2 cortes simultâneos, 4 threads do ffmpeg por corte
+  python batch_processor.py downloads/videos.csv --output-path downloads/videos --workers 8 --cut-workers 2 --cut-threads 4
+
+Cada vídeo é baixado inteiro e depois cortado, em etapas separadas: os
+downloads e os cortes têm limites próprios de concorrência. A saída de cada
+vídeo fica em <output-path>/logs/, e a falha de um vídeo não afeta os outros.
+
 O arquivo de entrada deve conter um cabeçalho com as seguintes colunas:
 - url (Obrigatório): A URL completa do vídeo do YouTube.
 - nome_do_arquivo (Recomendado): O nome desejado para o arquivo de saída.
@@ -34,6 +116,24 @@ O arquivo de entrada deve conter um cabeçalho com as seguintes colunas:
         required=True,
         help="O diretório global onde todos os vídeos e arquivos de log serão salvos."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Downloads simultâneos (limitados pela rede). Padrão: 4."
+    )
+    parser.add_argument(
+        "--cut-workers",
+        type=int,
+        default=2,
+        help="Cortes simultâneos (limitados pela CPU). Padrão: 2."
+    )
+    parser.add_argument(
+        "--cut-threads",
+        type=int,
+        default=None,
+        help="Threads do ffmpeg em cada corte. Padrão: escolha do ffmpeg."
+    )
 
     args = parser.parse_args()
 
@@ -74,67 +174,95 @@ O arquivo de entrada deve conter um cabeçalho com as seguintes colunas:
 
     print(f"✅ Encontrados {len(df)} vídeos para processar.")
 
-    # --- 3. Iterar e Executar Subprocesso ---
+    # --- 3. Montar os Trabalhos ---
     execution_logs = [] # Lista para armazenar os logs de execução
-    
+    jobs = []
+    logs_path = output_path / "logs"
+    staging_path = output_path / ".staging"
+    logs_path.mkdir(exist_ok=True)
+    staging_path.mkdir(exist_ok=True)
+
     for index, row in df.iterrows():
         video_number = index + 1
-        
+
         # Obter dados da linha, tratando valores ausentes (NaN)
         url = row.get('url')
         file_name = row.get('id')
         start_time = row.get('start_time')
         end_time = row.get('end_time')
 
-        print("\n" + "="*60)
-        print(f"▶️ Processando vídeo {video_number} de {len(df)} | URL: {url}")
-        print("="*60)
-
         if pd.isna(url):
-            print("⚠️ Aviso: Pulando linha porque a 'url' está vazia.")
+            print(f"⚠️ Aviso: Pulando o vídeo {video_number} porque a 'url' está vazia.")
             execution_logs.append({'video_number': video_number, 'url': '', 'status': 'Skipped', 'details': 'URL was empty'})
             continue
 
-        # Monta o comando para chamar o yt_cutter.py
-        command = [
+        staged_file = staging_path / f"{video_number:03d}.mp4"
+        metadata_log = staging_path / f"{video_number:03d}_metadata.xlsx"
+        download_command = [sys.executable, str(tool_script_path), str(url), "--download-to", str(staged_file)]
+        # Monta o comando para chamar o yt_cutter.py sobre o arquivo já baixado
+        cut_command = [
             sys.executable, str(tool_script_path), str(url),
             "--path", str(output_path),
-            "--log-file", str(output_path / "yt_cutter_metadata_log.xlsx")
+            "--log-file", str(metadata_log),
+            "--input-file", str(staged_file)
         ]
 
         if pd.notna(file_name):
-            command.extend(["--name", str(file_name)])
+            cut_command.extend(["--name", str(file_name)])
         if pd.notna(start_time):
             # Converte para string para garantir o formato correto
-            command.extend(["--start", str(start_time)])
+            cut_command.extend(["--start", str(start_time)])
         if pd.notna(end_time):
-            command.extend(["--end", str(end_time)])
+            cut_command.extend(["--end", str(end_time)])
+        if args.cut_threads:
+            cut_command.extend(["--threads", str(args.cut_threads)])
 
-        log_entry = {'video_number': video_number, 'url': url, 'command': ' '.join(command)}
+        log_path = logs_path / f"{video_number:03d}.log"
+        log_path.write_text('', encoding='utf-8')
+        jobs.append({
+            'video_number': video_number, 'url': url, 'staged_file': staged_file, 'metadata_log': metadata_log,
+            'download_command': download_command, 'cut_command': cut_command, 'log_path': log_path,
+        })
 
-        try:
-            print(f"🚀 Executando...")
-            result = subprocess.run(
-                command, check=True, capture_output=True, text=True, encoding='utf-8'
-            )
-            print("✅ Sucesso no processamento do vídeo.")
-            print("--- Saída do yt_cutter.py ---")
-            print(result.stdout)
-            
-            log_entry['status'] = 'Success'
-            log_entry['details'] = result.stdout.strip().split('\n')[-1] # Pega a última linha do log de sucesso
+    # --- 4. Executar: downloads e cortes em pools separados ---
+    print(f"🚀 Executando com {args.workers} download(s) e {args.cut_workers} corte(s) simultâneos...")
+    inicio = time.perf_counter()
+    results = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as downloads, ThreadPoolExecutor(max_workers=args.cut_workers) as cuts:
+        download_futures = {downloads.submit(download_stage, job): job for job in jobs}
+        cut_futures = {}
+        for future in as_completed(download_futures):
+            job = download_futures[future]
+            ok, details = future.result()
+            if ok:
+                print(f"⬇️ Vídeo {job['video_number']} baixado. Na fila de corte.")
+                cut_futures[cuts.submit(cut_stage, job)] = job
+            else:
+                print(f"❌ Falha no download do vídeo {job['video_number']}: {details} (log: {job['log_path']})", file=sys.stderr)
+                results[job['video_number']] = ('Failure', details)
+        for future in as_completed(cut_futures):
+            job = cut_futures[future]
+            ok, details = future.result()
+            if ok:
+                print(f"✅ Vídeo {job['video_number']} processado.")
+                results[job['video_number']] = ('Success', details)
+            else:
+                print(f"❌ Falha no corte do vídeo {job['video_number']}: {details} (log: {job['log_path']})", file=sys.stderr)
+                results[job['video_number']] = ('Failure', details)
 
-        except subprocess.CalledProcessError as e:
-            print("\n❌ Ocorreu um erro ao processar este vídeo.", file=sys.stderr)
-            print("--- Saída de Erro do yt_cutter.py ---", file=sys.stderr)
-            print(e.stderr, file=sys.stderr)
-            
-            log_entry['status'] = 'Failure'
-            log_entry['details'] = e.stderr.strip().split('\n')[-1] # Pega a última linha do log de erro
-        
-        execution_logs.append(log_entry)
+    for job in jobs:
+        status, details = results[job['video_number']]
+        execution_logs.append({
+            'video_number': job['video_number'], 'url': job['url'],
+            'command': ' && '.join(' '.join(command) for command in (job['download_command'], job['cut_command'])),
+            'status': status, 'details': details, 'log_file': str(job['log_path']),
+        })
+    execution_logs.sort(key=lambda entry: entry['video_number'])
+    merge_metadata_logs(jobs, output_path / "yt_cutter_metadata_log.xlsx")
+    falhas = sum(entry['status'] == 'Failure' for entry in execution_logs)
+    print(f"⏱️ {len(jobs)} vídeo(s) em {time.perf_counter() - inicio:.1f}s, {falhas} falha(s).")
 
-    # --- 4. Salvar Log de Execução ---
+    # --- 5. Salvar Log de Execução ---
     log_file_path = output_path / "batch_execution_log.xlsx"
     print("\n" + "="*60)
     print(f"💾 Salvando log de execução em lote para '{log_file_path}'")
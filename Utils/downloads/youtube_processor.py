@@ -2,6 +2,7 @@
 # Versão Final: Script robusto para baixar, cortar e registrar vídeos do YouTube.
 
 import argparse
+import json
 import os
 import re
 import sys
@@ -98,28 +99,82 @@ def log_to_excel(log_data: dict, log_file: str):
 
 # --- Função Principal de Processamento ---
 
+def fetch_info(video_url: str) -> dict:
+    """Busca no YouTube os metadados usados no registro."""
+    with YoutubeDL({'quiet': True}) as ydl:
+        info = ydl.extract_info(video_url, download=False)
+    return {
+        'title': info.get('title', 'youtube_video'),
+        'duration': info.get('duration', 0),
+        'duration_string': info.get('duration_string', '00:00:00'),
+        'upload_date': info.get('upload_date'),
+        'tags': info.get('tags', []),
+        'categories': info.get('categories', []),
+    }
+
+def download_full_video(video_url: str, directory: str) -> str:
+    """Baixa o vídeo inteiro (até 720p) para `directory` e devolve o caminho do arquivo."""
+    ydl_opts_download = {'format': 'bestvideo[height<=720]+bestaudio/best[height<=720]', 'outtmpl': os.path.join(directory, 'full_video.%(ext)s'), 'merge_output_format': 'mp4'}
+    with YoutubeDL(ydl_opts_download) as ydl: ydl.download([video_url])
+    downloaded_file_path = os.path.join(directory, 'full_video.mp4')
+    if not os.path.exists(downloaded_file_path):
+        potential_files = [f for f in os.listdir(directory) if f.startswith('full_video')]
+        if not potential_files: raise FileNotFoundError("Arquivo de vídeo baixado não encontrado no diretório temporário.")
+        downloaded_file_path = os.path.join(directory, potential_files[0])
+    return downloaded_file_path
+
+def download_only(video_url: str, destination: str):
+    """
+    Etapa de rede do processamento em lote: baixa o vídeo inteiro para
+    `destination` e grava os metadados ao lado (`destination`.json), para
+    que o corte (`--input-file`) não precise consultar o YouTube de novo.
+    """
+    try:
+        logging.info("Buscando informações do vídeo...")
+        info = fetch_info(video_url)
+        directory = os.path.dirname(os.path.abspath(destination))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.TemporaryDirectory(dir=directory) as tmpdir:
+            logging.info(f"Iniciando o download de '{info['title']}'...")
+            os.replace(download_full_video(video_url, tmpdir), destination)
+        # A URL identifica o download para o batch_processor.py reaproveitá-lo.
+        with open(f"{destination}.json", 'w', encoding='utf-8') as file:
+            json.dump({**info, 'url': video_url}, file, ensure_ascii=False)
+        logging.info(f"✅ Download completo: {destination}")
+    except Exception as e:
+        logging.error(f"Ocorreu um erro inesperado durante o download do vídeo: {e}")
+        sys.exit(1)
+
 def process_video(
     video_url: str,
     start_time: str = None,
     end_time: str = None,
     output_path: str = ".",
     output_name: str = None,
-    log_file: str = 'download_log.xlsx'
+    log_file: str = 'download_log.xlsx',
+    input_file: str = None,
+    threads: int = None
 ):
-    """Função principal para baixar, cortar, salvar e registrar o vídeo do YouTube."""
+    """
+    Função principal para baixar, cortar, salvar e registrar o vídeo do YouTube.
+    Com `input_file`, usa o vídeo já baixado por `download_only` em vez de baixá-lo.
+    """
     if start_time:
         check_ffmpeg()
 
     try:
-        logging.info("Buscando informações do vídeo...")
-        with YoutubeDL({'quiet': True}) as ydl:
-            info = ydl.extract_info(video_url, download=False)
-            video_title = info.get('title', 'youtube_video')
-            duration = info.get('duration', 0)
-            duration_string = info.get('duration_string', '00:00:00')
-            upload_date_str = info.get('upload_date')
-            tags = info.get('tags', [])
-            categories = info.get('categories', [])
+        if input_file and os.path.exists(f"{input_file}.json"):
+            with open(f"{input_file}.json", 'r', encoding='utf-8') as file:
+                info = json.load(file)
+        else:
+            logging.info("Buscando informações do vídeo...")
+            info = fetch_info(video_url)
+        video_title = info['title']
+        duration = info['duration']
+        duration_string = info['duration_string']
+        upload_date_str = info['upload_date']
+        tags = info['tags']
+        categories = info['categories']
 
         final_duration_seconds = duration
         final_duration_string = duration_string
@@ -143,16 +198,13 @@ def process_video(
         final_filepath = os.path.join(output_path, final_filename)
 
         with tempfile.TemporaryDirectory() as tmpdir:
-            ydl_opts_download = {'format': 'bestvideo[height<=720]+bestaudio/best[height<=720]', 'outtmpl': os.path.join(tmpdir, 'full_video.%(ext)s'), 'merge_output_format': 'mp4'}
-            logging.info(f"Iniciando o download de '{video_title}'...")
-            with YoutubeDL(ydl_opts_download) as ydl: ydl.download([video_url])
-            logging.info("Download completo.")
-
-            downloaded_file_path = os.path.join(tmpdir, 'full_video.mp4')
-            if not os.path.exists(downloaded_file_path):
-                potential_files = [f for f in os.listdir(tmpdir) if f.startswith('full_video')]
-                if not potential_files: raise FileNotFoundError("Arquivo de vídeo baixado não encontrado no diretório temporário.")
-                downloaded_file_path = os.path.join(tmpdir, potential_files[0])
+            if input_file:
+                if not os.path.exists(input_file): raise FileNotFoundError(f"Arquivo de entrada '{input_file}' não encontrado.")
+                downloaded_file_path = input_file
+            else:
+                logging.info(f"Iniciando o download de '{video_title}'...")
+                downloaded_file_path = download_full_video(video_url, tmpdir)
+                logging.info("Download completo.")
 
             if start_time:
                 logging.info(f"Cortando vídeo de {start_time} para {end_time or 'o fim'}...")
@@ -163,7 +215,7 @@ def process_video(
                     cut_video = video_clip.subclipped(start_seconds, end_seconds)
                     final_duration_seconds = cut_video.duration
                     final_duration_string = format_seconds_to_time_string(final_duration_seconds)
-                    cut_video.write_videofile(final_filepath, codec='libx264', audio_codec='aac', logger='bar')
+                    cut_video.write_videofile(final_filepath, codec='libx264', audio_codec='aac', logger='bar', threads=threads)
                     cut_video.close()
                 finally:
                     if video_clip: video_clip.close()
@@ -204,11 +256,18 @@ def main():
     parser.add_argument("--path", dest="output_path", type=str, default=".", help="Diretório de saída opcional.")
     parser.add_argument("--name", dest="output_name", type=str, default=None, help="Nome opcional para o arquivo de saída (sem extensão).")
     parser.add_argument("--log-file", dest="log_file", type=str, default="download_log.xlsx", help="Nome do arquivo Excel para registro. Padrão: 'download_log.xlsx'.")
+    # --- Etapas separadas (usadas pelo batch_processor.py com --workers) ---
+    parser.add_argument("--download-to", dest="download_to", type=str, default=None, help="Só baixa o vídeo inteiro para este arquivo (sem corte nem registro).")
+    parser.add_argument("--input-file", dest="input_file", type=str, default=None, help="Usa este arquivo já baixado com --download-to em vez de baixar o vídeo.")
+    parser.add_argument("--threads", type=int, default=None, help="Threads do ffmpeg no corte. Padrão: escolha do ffmpeg.")
 
     args = parser.parse_args()
 
+    if args.download_to:
+        download_only(args.url, args.download_to)
+        return
     # A chamada para process_video agora usa os argumentos nomeados diretamente
-    process_video(args.url, args.start_time, args.end_time, args.output_path, args.output_name, args.log_file)
+    process_video(args.url, args.start_time, args.end_time, args.output_path, args.output_name, args.log_file, args.input_file, args.threads)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
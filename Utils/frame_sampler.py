@@ -0,0 +1,190 @@
+"""
+Amostragem de frames compartilhada por llava_video.py, gpt.py e
+processador_video.py.
+
+Uma estratégia decide quais índices decodificar a partir do total de frames
+e do FPS do vídeo:
+
+    UniformSampler(64)            64 frames igualmente espaçados
+    FpsSampler(1, max_frames=64)  1 frame por segundo (uniforme acima do limite)
+    WindowSampler(30, 90, fps=2)  2 frames por segundo entre 30s e 90s
+
+`iter_frames` decodifica os índices escolhidos (RGB, uint8, formato
+(H, W, 3)). O cache em disco fica em frame_store.py: cada vídeo é
+decodificado uma vez para um arquivo mapeado em memória e as estratégias
+são aplicadas sobre ele (`FrameStore.sample`), para todos os modelos.
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+# Distância (em frames) a partir da qual o leitor OpenCV busca o próximo
+# frame em vez de decodificar e descartar os intermediários.
+SEEK_THRESHOLD = 120
+# Threads do decodificador do decord por vídeo (o leitor OpenCV ignora).
+DECODER_THREADS = 1
+
+
+class FrameSample(NamedTuple):
+    frames: np.ndarray
+    timestamps: np.ndarray
+    duration: float
+
+
+def fps_indices(video_fps: float, fps: float, total_frames: int = 0):
+    """
+    Gera os índices para `fps` frames por segundo. Cada índice é calculado a
+    partir do instante k / fps, então taxas fracionárias (ex: 29.97 FPS no
+    vídeo ou 0.5 FPS na amostragem) não acumulam desvio. Sem `total_frames`
+    o gerador é infinito.
+    """
+    step = video_fps / fps
+    k = 0
+    while True:
+        index = int(round(k * step))
+        if total_frames and index >= total_frames:
+            return
+        yield index
+        k += 1
+
+
+def fps_index_array(video_fps: float, fps: float, total_frames: int) -> np.ndarray:
+    """Os mesmos índices de `fps_indices`, calculados de uma vez com numpy."""
+    step = video_fps / fps
+    indices = np.rint(np.arange(int(np.ceil(total_frames / step)) + 1) * step).astype(int)
+    return indices[indices < total_frames]
+
+
+def uniform_indices(total_frames: int, num_frames: int, start: int = 0) -> np.ndarray:
+    """`num_frames` índices igualmente espaçados em [start, total_frames)."""
+    if total_frames - start <= num_frames:
+        return np.arange(start, total_frames)
+    return np.linspace(start, total_frames - 1, num_frames, dtype=int)
+
+
+class UniformSampler:
+    name = "uniform"
+
+    def __init__(self, num_frames: int):
+        self.num_frames = num_frames
+
+    def params(self) -> dict:
+        return {"num_frames": self.num_frames}
+
+    def indices(self, total_frames: int, video_fps: float) -> np.ndarray:
+        return uniform_indices(total_frames, self.num_frames)
+
+
+class FpsSampler:
+    name = "fps"
+
+    def __init__(self, fps: float = 1.0, max_frames: int | None = None):
+        self.fps = fps
+        self.max_frames = max_frames
+
+    def params(self) -> dict:
+        return {"fps": self.fps, "max_frames": self.max_frames}
+
+    def indices(self, total_frames: int, video_fps: float) -> np.ndarray:
+        indices = fps_index_array(video_fps, min(self.fps, video_fps), total_frames)
+        if self.max_frames and len(indices) > self.max_frames:
+            return uniform_indices(total_frames, self.max_frames)
+        return indices
+
+
+class WindowSampler:
+    """Frames entre `start` e `end` segundos, por quantidade ou por FPS."""
+
+    name = "window"
+
+    def __init__(self, start: float, end: float | None = None, num_frames: int | None = None, fps: float | None = None):
+        if (num_frames is None) == (fps is None):
+            raise ValueError("Informe exatamente um entre num_frames e fps.")
+        self.start = start
+        self.end = end
+        self.num_frames = num_frames
+        self.fps = fps
+
+    def params(self) -> dict:
+        return {"start": self.start, "end": self.end, "num_frames": self.num_frames, "fps": self.fps}
+
+    def indices(self, total_frames: int, video_fps: float) -> np.ndarray:
+        first = min(total_frames, int(round(self.start * video_fps)))
+        last = total_frames if self.end is None else min(total_frames, int(round(self.end * video_fps)))
+        if self.num_frames is not None:
+            return uniform_indices(last, self.num_frames, first)
+        step = fps_index_array(video_fps, min(self.fps, video_fps), last - first)
+        return first + step
+
+
+STRATEGIES = {sampler.name: sampler for sampler in (UniformSampler, FpsSampler, WindowSampler)}
+
+
+def make_sampler(name: str, **params):
+    if name not in STRATEGIES:
+        raise ValueError(f"Estratégia de amostragem desconhecida: '{name}'. Opções: {', '.join(sorted(STRATEGIES))}.")
+    return STRATEGIES[name](**params)
+
+
+def video_info(video_path: str) -> tuple[int, float]:
+    """Total de frames e FPS do vídeo."""
+    try:
+        from decord import VideoReader, cpu
+    except ImportError:
+        import cv2
+
+        video = cv2.VideoCapture(video_path)
+        info = int(video.get(cv2.CAP_PROP_FRAME_COUNT)), video.get(cv2.CAP_PROP_FPS) or 30.0
+        video.release()
+        return info
+    reader = VideoReader(video_path, ctx=cpu(0), num_threads=1)
+    return len(reader), reader.get_avg_fps()
+
+
+def _iter_decord(video_path: str, indices: np.ndarray, chunk_size: int = 32, threads: int = DECODER_THREADS):
+    from decord import VideoReader, cpu
+
+    reader = VideoReader(video_path, ctx=cpu(0), num_threads=threads)
+    for start in range(0, len(indices), chunk_size):
+        yield from reader.get_batch(indices[start:start + chunk_size].tolist()).asnumpy()
+
+
+def _iter_opencv(video_path: str, indices: np.ndarray):
+    """
+    Decodifica só os índices pedidos: avança com `grab()` (sem converter o
+    frame) e busca diretamente quando o próximo índice está longe.
+    """
+    import cv2
+
+    video = cv2.VideoCapture(video_path)
+    read = 0
+    position = 0
+    try:
+        for index in indices:
+            if index - position > SEEK_THRESHOLD:
+                video.set(cv2.CAP_PROP_POS_FRAMES, index)
+                position = index
+            while position < index:
+                if not video.grab():
+                    break
+                position += 1
+            success, frame = video.read()
+            if not success:
+                break
+            position += 1
+            read += 1
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    finally:
+        video.release()
+    if read < len(indices):
+        print(f"Aviso: só {read} de {len(indices)} frames puderam ser lidos de '{video_path}'.")
+
+
+def iter_frames(video_path: str, indices: np.ndarray, threads: int = DECODER_THREADS):
+    """Gera os frames RGB nos índices dados, com decord se instalado ou OpenCV."""
+    try:
+        import decord  # noqa: F401
+    except ImportError:
+        return _iter_opencv(video_path, indices)
+    return _iter_decord(video_path, indices, threads=threads)
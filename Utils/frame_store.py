@@ -0,0 +1,182 @@
+"""
+Armazenamento dos frames de um vídeo em um arquivo mapeado em memória.
+
+Cada vídeo (e resolução) é decodificado uma única vez, a `fps` frames por
+segundo, para um arquivo contíguo uint8 de formato (N, H, W, 3), mais um
+índice JSON com os instantes de cada frame. Depois disso qualquer
+amostragem (8, 16, 32, 64 ou 200 frames) é lida do arquivo pelo cache de
+páginas do sistema, sem passar pelo decodificador. Amostragens mais densas
+que o arquivo (ex: 64 frames de um clipe de 30s a 2 FPS) são decodificadas
+direto do vídeo, para não devolver menos frames que o pedido. A amostra é
+uma cópia só dos frames escolhidos (o passo de `uniform_indices` raramente
+é constante); fatias sem cópia ficam para quem pede posições de passo
+constante a `take`.
+
+    store = FrameStore("downloads/videos/27.mp4", height=384)
+    frames, timestamps, duration = store.sample(frame_sampler.UniformSampler(64))
+"""
+
+import json
+import os
+import threading
+
+import numpy as np
+
+import frame_sampler
+import utils
+
+FRAME_STORE_DIR = ".cache/frame_store"
+FRAME_STORE_VERSION = 2
+# Densidade padrão do arquivo: amostragens mais densas que isso são
+# decodificadas direto do vídeo (`FrameStore.sample`).
+STORE_FPS = 2.0
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _resize(frame: np.ndarray, height: int | None) -> np.ndarray:
+    """Reduz o frame para `height` linhas; nunca amplia."""
+    if height is None or frame.shape[0] <= height:
+        return frame
+    import cv2
+
+    width = max(1, int(round(frame.shape[1] * height / frame.shape[0])))
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+class FrameStore:
+    def __init__(self, video_path: str, height: int | None = None, fps: float = STORE_FPS,
+                 store_dir: str = FRAME_STORE_DIR, decoder_threads: int = frame_sampler.DECODER_THREADS):
+        self.video_path = video_path
+        self.decoder_threads = decoder_threads
+        self.height = height
+        self.fps = fps
+        resolution = f"{height}p" if height else "orig"
+        base = os.path.join(store_dir, f"{utils.hash_file(video_path)}_{resolution}_{fps:g}fps")
+        self.data_path = f"{base}.npy"
+        self.index_path = f"{base}.json"
+        self._frames = None
+        self._index = None
+
+    def _build(self):
+        total_frames, video_fps = frame_sampler.video_info(self.video_path)
+        indices = frame_sampler.FpsSampler(self.fps).indices(total_frames, video_fps)
+        os.makedirs(os.path.dirname(self.data_path) or ".", exist_ok=True)
+        tmp_path = f"{self.data_path}.{os.getpid()}.{threading.get_ident()}.tmp.npy"
+
+        frames = None
+        count = 0
+        for frame in frame_sampler.iter_frames(self.video_path, indices, self.decoder_threads):
+            frame = _resize(frame, self.height)
+            if frames is None:
+                frames = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.uint8, shape=(len(indices), *frame.shape))
+            frames[count] = frame
+            count += 1
+        if frames is None:
+            raise ValueError(f"Nenhum frame pôde ser lido de '{self.video_path}'.")
+        shape = (count, *frames.shape[1:])
+        frames.flush()
+        del frames
+
+        index = {
+            "version": FRAME_STORE_VERSION,
+            "shape": shape,
+            "timestamps": (indices[:count] / video_fps).tolist(),
+            "duration": total_frames / video_fps,
+            "total_frames": total_frames,
+            "video_fps": video_fps,
+        }
+        # O índice é gravado depois dos dados: sem ele o arquivo é refeito.
+        os.replace(tmp_path, self.data_path)
+        tmp_index = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_index, "w", encoding="utf-8") as file:
+            json.dump(index, file)
+        os.replace(tmp_index, self.index_path)
+
+    def _read_index(self) -> dict | None:
+        if not (os.path.exists(self.index_path) and os.path.exists(self.data_path)):
+            return None
+        with open(self.index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+        return index if index.get("version") == FRAME_STORE_VERSION else None
+
+    def open(self) -> "FrameStore":
+        """Mapeia o arquivo, decodificando o vídeo antes se necessário."""
+        if self._frames is not None:
+            return self
+        index = self._read_index()
+        if index is None:
+            # Várias threads pedindo o mesmo vídeo o decodificam uma única vez.
+            with _locks_guard:
+                lock = _locks.setdefault(self.data_path, threading.Lock())
+            with lock:
+                index = self._read_index()
+                if index is None:
+                    self._build()
+                    index = self._read_index()
+        frames = np.load(self.data_path, mmap_mode="r")
+        # O número de frames lidos pode ser menor que o previsto no cabeçalho.
+        self._frames = frames[:index["shape"][0]]
+        self._index = index
+        return self
+
+    @property
+    def frames(self) -> np.ndarray:
+        return self.open()._frames
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return np.asarray(self.open()._index["timestamps"])
+
+    @property
+    def duration(self) -> float:
+        return self.open()._index["duration"]
+
+    def take(self, positions: np.ndarray) -> np.ndarray:
+        """Frames nas posições dadas; fatia sem cópia quando o passo é constante."""
+        positions = np.asarray(positions, dtype=int)
+        if len(positions) == 0:
+            return self.frames[:0]
+        steps = np.diff(positions)
+        if len(positions) == 1 or (steps[0] > 0 and (steps == steps[0]).all()):
+            step = steps[0] if len(steps) else 1
+            return self.frames[positions[0]:positions[-1] + 1:step]
+        return self.frames[positions]
+
+    def uniform_positions(self, num_frames: int) -> np.ndarray:
+        """
+        `num_frames` posições igualmente espaçadas do primeiro ao último frame
+        do arquivo (`frame_sampler.uniform_indices`).
+        """
+        return frame_sampler.uniform_indices(len(self.timestamps), num_frames)
+
+    def _decode(self, indices: np.ndarray) -> frame_sampler.FrameSample:
+        """Decodifica os índices dados direto do vídeo, sem passar pelo arquivo."""
+        frames = [_resize(frame, self.height)
+                  for frame in frame_sampler.iter_frames(self.video_path, indices, self.decoder_threads)]
+        if not frames:
+            raise ValueError(f"Nenhum frame pôde ser lido de '{self.video_path}'.")
+        timestamps = indices[:len(frames)] / self._index["video_fps"]
+        return frame_sampler.FrameSample(np.stack(frames), timestamps, self.duration)
+
+    def sample(self, sampler) -> frame_sampler.FrameSample:
+        """
+        Aplica a estratégia sobre os frames do arquivo, tratando-o como um
+        vídeo de `fps` quadros por segundo. Se o arquivo tiver menos frames
+        que a estratégia pediria ao vídeo original, os frames são
+        decodificados direto do vídeo.
+        """
+        timestamps = self.timestamps
+        if hasattr(sampler, "positions"):
+            # Estratégias que olham o conteúdo (ex: keyframes.ShotSampler).
+            positions = sampler.positions(self)
+        else:
+            if isinstance(sampler, frame_sampler.UniformSampler):
+                positions = self.uniform_positions(sampler.num_frames)
+            else:
+                positions = sampler.indices(len(timestamps), self.fps)
+            wanted = sampler.indices(self._index["total_frames"], self._index["video_fps"])
+            if len(wanted) > len(positions):
+                return self._decode(np.asarray(wanted))
+        return frame_sampler.FrameSample(self.take(positions), timestamps[positions], self.duration)
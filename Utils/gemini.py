@@ -1,26 +1,52 @@
 import sys
 import time
+import argparse
+import queue
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from google import genai
 from google.genai import types
 import os
 from dotenv import load_dotenv
 import json
 import utils
+import proxy
+import scheduler
+import result_sink
+from gemini_local import LocalGeminiClient
+from response_cache import ResponseCache
 import logging
 
 ID_STORAGE_FILE = "uploaded_video_ids.txt"
 
+# Esquema da resposta no modo em lote: uma letra por ID de pergunta.
+BATCH_RESPONSE_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "question_id": types.Schema(type=types.Type.STRING),
+            "answer": types.Schema(type=types.Type.STRING, enum=["A", "B", "C", "D"]),
+        },
+        required=["question_id", "answer"],
+    ),
+)
+
 # --- Funções de Gerenciamento da API ---
 
-def upload_video(file_path: str, client) -> str | None:
+def upload_video(file_path: str, client, proxy_profile=None) -> str | None:
     """
     Faz o upload de um arquivo de vídeo para o serviço de arquivos do Gemini,
-    aguarda o processamento e retorna o ID único do arquivo.
+    aguarda o processamento e retorna o ID único do arquivo. Com
+    `proxy_profile`, envia a versão reduzida gerada por `proxy.make_proxy`.
     """
     logging.info(f"Iniciando o upload do arquivo: {file_path}")
     if not os.path.exists(file_path):
         logging.error(f"Arquivo não encontrado: {file_path}")
         return None
+    if proxy_profile:
+        file_path = proxy.make_proxy(file_path, proxy_profile)
 
     video_file = None
     try:
@@ -29,11 +55,9 @@ def upload_video(file_path: str, client) -> str | None:
             f"Arquivo enviado. Aguardando processamento... (ID temporário: {video_file.name})"
         )
 
-        while video_file.state.name == "PROCESSING":
-            time.sleep(5)
-            video_file = client.files.get(name=video_file.name)
+        video_file = wait_for_processing(video_file, client)
 
-        if video_file.state.name == "FAILED":
+        if video_file.state.name != "ACTIVE":
             logging.error(f"O processamento do arquivo '{file_path}' na API falhou.")
             return None
 
@@ -52,6 +76,144 @@ def upload_video(file_path: str, client) -> str | None:
         return None
 
 
+def get_or_upload_video(file_path: str, client, stored_name=None, proxy_profile=None):
+    """Reaproveita o arquivo `stored_name` se ainda estiver ACTIVE na API; senão, envia o vídeo."""
+    if stored_name:
+        media = get_video_by_id(stored_name, client)
+        if media is not None and media.state.name == "ACTIVE":
+            logging.info(f"Vídeo encontrado: {media.name}")
+            return media
+    return upload_video(file_path, client, proxy_profile)
+
+
+def wait_for_processing(video_file, client, initial_delay=1.0, max_delay=20.0, factor=1.5):
+    """
+    Aguarda o arquivo sair do estado PROCESSING consultando a API com
+    intervalos crescentes (backoff) em vez de um intervalo fixo.
+    """
+    delay = initial_delay
+    while video_file.state.name == "PROCESSING":
+        time.sleep(delay)
+        delay = min(delay * factor, max_delay)
+        video_file = client.files.get(name=video_file.name)
+    return video_file
+
+
+class UploadPipeline:
+    """
+    Envia vídeos em segundo plano e acompanha o processamento de vários
+    arquivos ao mesmo tempo.
+
+    O pool de uploads só fica ocupado durante a transferência; a espera pelo
+    processamento é feita por uma única thread que consulta todos os arquivos
+    pendentes, cada um com seu próprio backoff. Iterar sobre o pipeline
+    devolve `(chave, arquivo)` na ordem em que os vídeos ficam ACTIVE
+    (`arquivo` é None quando o vídeo não pôde ser preparado).
+    """
+
+    def __init__(self, client, max_uploads=2, initial_delay=1.0, max_delay=20.0, factor=1.5, timeout=900,
+                 proxy_profile=None):
+        self.client = client
+        self.proxy_profile = proxy_profile
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.timeout = timeout
+        self.pool = ThreadPoolExecutor(max_workers=max_uploads)
+        self.ready = queue.Queue()
+        self.processing = {}
+        self.condition = threading.Condition()
+        self.submitted = 0
+        self.closed = False
+        self.poller = threading.Thread(target=self._poll_loop, daemon=True)
+        self.poller.start()
+
+    def submit(self, key, file_path, external_name=None):
+        """Agenda um vídeo, reaproveitando `external_name` se ainda existir na API."""
+        self.submitted += 1
+        self.pool.submit(self._start, key, file_path, external_name)
+
+    def __iter__(self):
+        for _ in range(self.submitted):
+            yield self.ready.get()
+
+    def close(self):
+        self.pool.shutdown(wait=True)
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.poller.join()
+
+    def _start(self, key, file_path, external_name):
+        try:
+            print(f"Processando vídeo: {key}")
+            media = get_video_by_id(external_name, self.client) if external_name is not None else None
+            if media:
+                print(f"Vídeo encontrado: {media.name}")
+            else:
+                if not os.path.exists(file_path):
+                    print(f"Arquivo de vídeo não encontrado: {file_path}. Pulando...")
+                    self.ready.put((key, None))
+                    return
+                if self.proxy_profile:
+                    file_path = proxy.make_proxy(file_path, self.proxy_profile)
+                print(f"Enviando vídeo: {key}")
+                media = self.client.files.upload(file=file_path)
+                logging.info(f"Arquivo enviado. Aguardando processamento... (ID temporário: {media.name})")
+            self._track(key, media, time.monotonic())
+        except Exception as e:
+            logging.error(f"Ocorreu um erro durante o upload do vídeo {key}: {e}")
+            self.ready.put((key, None))
+
+    def _track(self, key, media, started, delay=None):
+        state = media.state.name
+        if state == "PROCESSING":
+            if time.monotonic() - started > self.timeout:
+                logging.error(f"Timeout aguardando o processamento de '{media.name}'.")
+                self._discard(key, media)
+                return
+            delay = self.initial_delay if delay is None else min(delay * self.factor, self.max_delay)
+            with self.condition:
+                self.processing[media.name] = (key, media, started, delay, time.monotonic() + delay)
+                self.condition.notify_all()
+        elif state == "ACTIVE":
+            logging.info(f"✅ Arquivo processado com sucesso! ID Final: {media.name}")
+            save_video_id(media.name)
+            self.ready.put((key, media))
+        else:
+            logging.error(f"O processamento do arquivo '{media.name}' na API falhou ({state}).")
+            self._discard(key, media)
+
+    def _discard(self, key, media):
+        try:
+            self.client.files.delete(name=media.name)
+        except Exception as e:
+            logging.warning(f"Não foi possível remover o arquivo com falha '{media.name}': {e}")
+        self.ready.put((key, None))
+
+    def _poll_loop(self):
+        while True:
+            with self.condition:
+                while not self.processing and not self.closed:
+                    self.condition.wait()
+                if self.closed and not self.processing:
+                    return
+                now = time.monotonic()
+                due = [name for name, entry in self.processing.items() if entry[4] <= now]
+                if not due:
+                    next_poll = min(entry[4] for entry in self.processing.values())
+                    self.condition.wait(timeout=next_poll - now)
+                    continue
+                entries = [self.processing.pop(name) for name in due]
+
+            for key, media, started, delay, _ in entries:
+                try:
+                    media = self.client.files.get(name=media.name)
+                except Exception as e:
+                    logging.warning(f"Falha ao consultar '{media.name}', tentando novamente: {e}")
+                self._track(key, media, started, delay)
+
+
 def save_video_id(file_id: str):
     """
     Salva (anexa) um ID de arquivo em um arquivo de texto local.
@@ -111,21 +273,203 @@ def delete_video_by_id(file_id: str, client):
         logging.error(f"Ocorreu um erro ao deletar o arquivo: {e}")
 
 
-def callApi(file, question_text, model, client):
+def callApi(file, question_text, model, client, limiter=None, estimated_tokens=0, config=None, cached_content=None, retry=None):
     """Chama a API do Gemini para responder a uma pergunta baseada em um vídeo."""
-    while True:
+    return generate_response(file, question_text, model, client, limiter, estimated_tokens, config, cached_content, retry).text
+
+def generate_response(file, question_text, model, client, limiter=None, estimated_tokens=0, config=None, cached_content=None, retry=None):
+    """
+    Igual a `callApi`, mas devolve a resposta completa da API (com o uso de
+    tokens em `usage_metadata`).
+
+    Se `limiter` for informado, a chamada respeita os limites de RPM/TPM do
+    cliente e o saldo de tokens é corrigido com o consumo real da resposta.
+    Com `cached_content`, o vídeo não é reenviado: a pergunta referencia o
+    cache de contexto criado para ele. Erros transitórios (429, 5xx, rede)
+    são repetidos conforme `retry`; erros fatais são propagados.
+    """
+    contents = [file, question_text]
+    if cached_content is not None:
+        contents = [question_text]
+        if config is None:
+            config = types.GenerateContentConfig(cached_content=cached_content.name)
+        else:
+            config = config.model_copy(update={"cached_content": cached_content.name})
+
+    def attempt():
+        if limiter:
+            limiter.acquire(estimated_tokens)
+        return client.models.generate_content(model=model, contents=contents, config=config)
+
+    response = (retry or scheduler.RetryPolicy()).call(attempt)
+
+    if limiter:
+        usage = getattr(response, "usage_metadata", None)
+        limiter.record_usage(estimated_tokens, getattr(usage, "total_token_count", None))
+
+    return response
+
+class ContextCacheManager:
+    """
+    Mantém um cache de contexto (tokens do vídeo já processados) por vídeo
+    enquanto houver perguntas dele na fila.
+
+    O TTL acompanha a fila: é calculado a partir do número de perguntas
+    restantes e renovado a cada resposta. Quando a última pergunta termina,
+    o cache é apagado. Se a criação falhar (modelo sem suporte, vídeo curto
+    demais), as perguntas usam o arquivo diretamente.
+    """
+
+    def __init__(self, client, model, seconds_per_question=30, min_ttl=120):
+        self.client = client
+        self.model = model
+        self.seconds_per_question = seconds_per_question
+        self.min_ttl = min_ttl
+        self.handles = {}
+        self.remaining = {}
+        self.lock = threading.Lock()
+
+    def _ttl(self, questions_left: int) -> str:
+        return f"{max(self.min_ttl, questions_left * self.seconds_per_question)}s"
+
+    def open(self, key, file, questions_left: int):
         try:
-            response = client.models.generate_content(
-                model=model, contents=[file, question_text]
+            handle = self.client.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    contents=[file], display_name=f"besim-{key}", ttl=self._ttl(questions_left)
+                ),
             )
-            break
         except Exception as e:
-            print(f"Erro: {e}")
-            print("Tentando novamente...")
-            time.sleep(5)
-            continue
+            logging.warning(f"Não foi possível criar o cache de contexto para o vídeo {key}: {e}")
+            return None
+        logging.info(f"Cache de contexto criado para o vídeo {key}: {handle.name}")
+        with self.lock:
+            self.handles[key] = handle
+            self.remaining[key] = questions_left
+        return handle
+
+    def release(self, key):
+        """Marca uma pergunta do vídeo como concluída."""
+        with self.lock:
+            if key not in self.handles:
+                return
+            self.remaining[key] -= 1
+            handle = self.handles[key]
+            left = self.remaining[key]
+            if left <= 0:
+                del self.handles[key], self.remaining[key]
+        try:
+            if left <= 0:
+                self.client.caches.delete(name=handle.name)
+                logging.info(f"Cache de contexto '{handle.name}' removido.")
+            else:
+                self.client.caches.update(
+                    name=handle.name, config=types.UpdateCachedContentConfig(ttl=self._ttl(left))
+                )
+        except Exception as e:
+            logging.warning(f"Falha ao atualizar o cache de contexto '{handle.name}': {e}")
+
+    def close(self):
+        with self.lock:
+            handles = list(self.handles.values())
+            self.handles.clear()
+            self.remaining.clear()
+        for handle in handles:
+            try:
+                self.client.caches.delete(name=handle.name)
+            except Exception as e:
+                logging.warning(f"Falha ao remover o cache de contexto '{handle.name}': {e}")
+
+def is_missing_cache(error) -> bool:
+    """Erro de cache de contexto expirado ou removido (404 ou menção ao CachedContent)."""
+    return scheduler.error_status(error) == 404 or "cachedcontent" in str(error).lower()
+
+def answer_question(cache, key, question_id, file, question_text, model, client, limiter=None, estimated_tokens=0, cached_content=None, retry=None):
+    """
+    Responde a pergunta e grava a resposta no cache assim que ela chega.
+    Devolve um dicionário com a resposta bruta, a latência e os tokens.
+    """
+    inicio = time.perf_counter()
+    try:
+        response = generate_response(file, question_text, model, client, limiter, estimated_tokens, cached_content=cached_content, retry=retry)
+    except Exception as e:
+        # O cache pode expirar enquanto a pergunta espera na fila do pool:
+        # nesse caso a pergunta é refeita com o arquivo do vídeo.
+        if cached_content is None or not is_missing_cache(e):
+            raise
+        logging.warning(f"Cache de contexto '{cached_content.name}' indisponível ({e}); usando o arquivo do vídeo.")
+        response = generate_response(file, question_text, model, client, limiter, estimated_tokens, retry=retry)
+    latency = time.perf_counter() - inicio
+    cache.put(key, response.text, model=model, question_id=question_id)
+    usage = getattr(response, "usage_metadata", None)
+    return {"raw_response": response.text, "latency": latency, "tokens": getattr(usage, "total_token_count", None)}
+
+def parse_batch_answers(text: str, question_ids) -> dict | None:
+    """
+    Converte a resposta JSON do modo em lote em {question_id: letra}.
+    Retorna None se o JSON for inválido ou faltar alguma pergunta.
+    """
+    by_text = {str(question_id): question_id for question_id in question_ids}
+    try:
+        items = json.loads(text)
+        answers = {
+            by_text[str(item["question_id"]).strip()]: item["answer"]
+            for item in items
+            if str(item["question_id"]).strip() in by_text
+        }
+    except (json.JSONDecodeError, TypeError, KeyError, AttributeError):
+        return None
+    if len(answers) != len(by_text):
+        return None
+    return answers
+
+def ask_video_batch(questions: dict, file, model, client, limiter=None, seconds=None, retry=None) -> dict:
+    """
+    Envia todas as perguntas de um vídeo em uma única chamada com resposta
+    estruturada e devolve {question_id: resposta}. Se o lote não puder ser
+    interpretado, cai para uma chamada por pergunta.
+    """
+    prompt = utils.createBatchQuestion(questions)
+    tokens = scheduler.estimate_tokens(prompt, seconds)
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json", response_schema=BATCH_RESPONSE_SCHEMA
+    )
+    answers = parse_batch_answers(
+        callApi(file, prompt, model, client, limiter, tokens, config=config, retry=retry), list(questions)
+    )
+
+    if answers is None:
+        logging.warning(f"Resposta em lote inválida para '{file.name}'. Enviando as perguntas uma a uma.")
+        answers = {}
+        for question_id, question in questions.items():
+            question_text = utils.createQuestion(question)
+            answers[question_id] = callApi(file, question_text, model, client, limiter,
+                                           scheduler.estimate_tokens(question_text, seconds), retry=retry)
+    return answers
 
-    return response.text
+def answer_video_batch(cache, items, questions, file, model, client, limiter=None, seconds=None, retry=None):
+    """
+    Versão de `ask_video_batch` que grava cada resposta no cache. Devolve,
+    por pergunta, o mesmo dicionário de `answer_question`.
+    """
+    inicio = time.perf_counter()
+    answers = ask_video_batch(
+        {question_id: questions[question_id] for question_id, _, _ in items}, file, model, client, limiter, seconds, retry
+    )
+    latency = time.perf_counter() - inicio
+    for question_id, _, key in items:
+        cache.put(key, answers[question_id], model=model, question_id=question_id, batch=True)
+    return {
+        question_id: {"raw_response": answer, "latency": latency, "tokens": None, "batch": True}
+        for question_id, answer in answers.items()
+    }
+
+def video_duration(video) -> float | None:
+    """Duração do trecho do vídeo segundo a tabela (None se desconhecida)."""
+    if video.get("start") is None or video.get("end") is None:
+        return None
+    return video["end"] - video["start"]
 
 def loadUploadedVideoIds(file_path) -> dict:
     """Carrega os IDs de vídeos já enviados para a API do Gemini."""
@@ -143,70 +487,189 @@ def loadUploadedVideoIds(file_path) -> dict:
         
 def saveUploadedVideoIds(ids: dict, file_path):
     """Salva os IDs de vídeos enviados para a API do Gemini em um arquivo JSON."""
+    if os.path.dirname(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
     with open(file_path, "w", encoding="utf-8") as file:
         json.dump(ids, file, ensure_ascii=False, indent=4)
     print(f"IDs de vídeos salvos com sucesso em '{file_path}'.")
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Avalia o BeSIM com o Gemini, enviando as perguntas em paralelo."
+    )
+    parser.add_argument("--model", default="gemini-1.5-pro", help="Modelo do Gemini a ser avaliado.")
+    parser.add_argument("--table", default="BeSimV5.xlsx", help="Planilha com as perguntas e os vídeos.")
+    parser.add_argument("--max-requests", type=int, default=8, help="Chamadas simultâneas a generate_content.")
+    parser.add_argument("--max-uploads", type=int, default=2, help="Uploads de vídeo simultâneos.")
+    parser.add_argument("--rpm", type=float, default=None, help="Limite de requisições por minuto (padrão: sem limite).")
+    parser.add_argument("--tpm", type=float, default=None, help="Limite de tokens por minuto (padrão: sem limite).")
+    parser.add_argument("--max-retries", type=int, default=200, help="Orçamento total de retentativas da execução.")
+    parser.add_argument("--batch", action="store_true", help="Envia todas as perguntas de um vídeo em uma única chamada.")
+    parser.add_argument("--context-cache", action="store_true",
+                        help="Cria um cache de contexto por vídeo e reaproveita os tokens do vídeo entre as perguntas.\n"
+                             "Exige um modelo com versão explícita (ex: gemini-1.5-pro-002). Ignorado com --batch.")
+    parser.add_argument("--local", action="store_true", help="Usa o cliente local de gemini_local.py (sem rede, para testes).")
+    parser.add_argument("--proxy", action="store_true",
+                        help="Envia uma versão reduzida do vídeo (FPS/resolução do perfil 'gemini' em proxy.py).")
+    parser.add_argument("--results", default=None,
+                        help="Arquivo .jsonl (ou diretório Parquet) onde cada resposta é gravada ao chegar.\n"
+                             "Padrão: responses/responses_<modelo>.jsonl")
+    parser.add_argument("--no-excel", action="store_true", help="Não exporta a planilha .xlsx ao final.")
+    parser.add_argument("--cache-file", default="cache/responses_cache.jsonl", help="Cache persistente de respostas.")
+    return parser.parse_args()
+
+def local_path(path: str) -> str:
+    """Com --local, os arquivos vão para uma subpasta 'local' e não se misturam aos da API real."""
+    return os.path.join(os.path.dirname(path), "local", os.path.basename(path))
+
 def main():
+    args = parse_args()
     # Carrega variáveis do arquivo .env
     load_dotenv()
     api_key = os.getenv("API_GOOGLE")
-    client = genai.Client(api_key=api_key)
-    model = "gemini-1.5-pro"
+    client = LocalGeminiClient() if args.local else genai.Client(api_key=api_key)
+    model = args.model
     
-    TABLE = "BeSimV5.xlsx"
-    ID_STORAGE_FILE = "log/uploaded_video_ids_gemini.json"
+    TABLE = args.table
+    # Os proxies são arquivos diferentes dos originais na API.
+    ID_STORAGE_FILE = "log/uploaded_video_ids_gemini_proxy.json" if args.proxy else "log/uploaded_video_ids_gemini.json"
+    proxy_profile = "gemini" if args.proxy else None
+    request_config = {"batch": True} if args.batch else {}
+    if proxy_profile:
+        request_config["proxy"] = proxy_profile
+    # As respostas falsas do cliente local nunca podem virar acertos de cache de uma execução real.
+    output = local_path if args.local else (lambda path: path)
+    if args.local:
+        request_config["local"] = True
+        ID_STORAGE_FILE = output(ID_STORAGE_FILE)
 
     # Carrega o arquivo JSON de perguntas
     questions = utils.load_questions(TABLE)
     videos = utils.load_video_table(TABLE)
     ids_gemini = loadUploadedVideoIds(ID_STORAGE_FILE)
+    limiter = scheduler.RateLimiter(args.rpm, args.tpm)
+    # A concorrência efetiva começa na metade do pool e se adapta às
+    # respostas 429/503 da API, sem passar de --max-requests.
+    retry = scheduler.RetryPolicy(
+        limiter=scheduler.AdaptiveLimiter(initial=max(1, args.max_requests // 2), maximum=args.max_requests),
+        budget=scheduler.RetryBudget(args.max_retries),
+        breaker=scheduler.CircuitBreaker(),
+    )
+    cache = ResponseCache(output(args.cache_file))
+    results_path = output(args.results or f"responses/responses_{model}.jsonl")
+    sink = result_sink.open_sink(results_path)
+
+    def record(video_id, question_id, raw_response, **extra):
+        """Grava a resposta no arquivo de resultados assim que ela chega."""
+        question = questions[video_id][question_id]
+        response = utils.process_response(raw_response)
+        sink.write({
+            "question_id": question_id, "video_id": video_id, "model": model,
+            "raw_response": raw_response, "response": response, "answer": question["answer"],
+            "is_correct": response == question["answer"], **extra,
+        })
+
+    def on_done(future, video_id, question_id=None):
+        """Grava o resultado de um future concluído com sucesso (lote: todas as perguntas)."""
+        if future.exception() is not None:
+            return
+        result = future.result()
+        if question_id is None:
+            for batch_question_id, batch_result in result.items():
+                record(video_id, batch_question_id, **batch_result)
+        else:
+            record(video_id, question_id, **result)
 
-    responses = None
-    corretas = 0
-    total = 0
+    # Respostas já presentes no cache não são pedidas de novo; vídeos com
+    # todas as perguntas em cache nem chegam a ser enviados.
+    answers = {}
+    missing = {}
     for video_id in videos:
-        external_name =  ids_gemini[str(video_id)] if str(video_id) in ids_gemini else None
-        print(f"Processando vídeo: {video_id}")
-
-        media = get_video_by_id(external_name, client) if external_name is not None else None
-
-        if not media:
-            path = f"downloads/videos/{str(int(video_id))}.mp4"
-            if not os.path.exists(path):
-                print(f"Arquivo de vídeo não encontrado: {path}. Pulando...")
+        path = f"downloads/videos/{str(int(video_id))}.mp4"
+        if not os.path.exists(path):
+            print(f"Arquivo de vídeo não encontrado: {path}. Pulando...")
+            continue
+        video_hash = utils.hash_file(path)
+        for question_id, question in questions.get(video_id, {}).items():
+            question_text = utils.createQuestion(question)
+            key = ResponseCache.make_key(model, video_hash, question_text, request_config or None)
+            if key in cache:
+                answers[question_id] = cache.get(key)
+                record(video_id, question_id, answers[question_id], cached=True)
+            else:
+                missing.setdefault(video_id, []).append((question_id, question_text, key))
+    print(f"Respostas em cache: {len(answers)}. Chamadas pendentes: {sum(map(len, missing.values()))}.")
+
+    # Os uploads rodam em segundo plano: as perguntas de um vídeo são
+    # despachadas assim que ele fica ACTIVE, enquanto os próximos ainda são
+    # enviados ou processados pela API.
+    pipeline = UploadPipeline(client, max_uploads=args.max_uploads, proxy_profile=proxy_profile)
+    for video_id in missing:
+        pipeline.submit(video_id, f"downloads/videos/{str(int(video_id))}.mp4", ids_gemini.get(str(video_id)))
+
+    contexts = ContextCacheManager(client, model) if args.context_cache and not args.batch else None
+    pending = {}
+    with ThreadPoolExecutor(max_workers=args.max_requests) as request_pool:
+        for video_id, media in pipeline:
+            if not media:
+                continue
+            if ids_gemini.get(str(video_id)) != media.name:
+                ids_gemini[str(video_id)] = media.name
+                saveUploadedVideoIds(ids_gemini, ID_STORAGE_FILE)
+
+            seconds = video_duration(videos[video_id])
+            if args.batch:
+                future = request_pool.submit(
+                    answer_video_batch, cache, missing[video_id], questions[video_id], media, model, client, limiter, seconds, retry
+                )
+                for question_id, _, _ in missing[video_id]:
+                    pending[question_id] = future
+                future.add_done_callback(functools.partial(on_done, video_id=video_id))
                 continue
 
-            print(f"Enviando vídeo: {video_id}")
-            media = upload_video(path, client)
-            print(f"Vídeo enviado: {media.name}")
-            ids_gemini[video_id] = media.name
-            
-        else:
-            print(f"Vídeo encontrado: {media.name}")
-            
-
-        for question_id in questions[video_id]:
-            question = questions[video_id][question_id]
-            correct = False
-            total += 1
-            question_text = utils.createQuestion(question)
-            print(f"Enviando pergunta: \n{question_text}")
-            response = callApi(media, question_text, model, client)
-            response = utils.process_response(response)
-            print()
-            print(f"Resposta: {response}")
-            print()
-            if response == question["answer"]:
-                correct = True
-                print("Resposta correta")
-                corretas += 1
-
-            # Save the response for the current question
-            responses = utils.addResponses(question_id, response, correct, responses)
-
-    # Save the updated responses back to the file
-    utils.saveResponses(responses, f"responses/responses_{model}.xlsx")
+            handle = contexts.open(video_id, media, len(missing[video_id])) if contexts else None
+            for question_id, question_text, key in missing[video_id]:
+                tokens = scheduler.estimate_tokens(question_text, seconds)
+                pending[question_id] = request_pool.submit(
+                    answer_question, cache, key, question_id, media, question_text, model, client, limiter, tokens, handle, retry
+                )
+                pending[question_id].add_done_callback(
+                    functools.partial(on_done, video_id=video_id, question_id=question_id)
+                )
+                if handle:
+                    pending[question_id].add_done_callback(lambda _, video_id=video_id: contexts.release(video_id))
+        pipeline.close()
+
+        # O resumo é calculado na ordem da planilha, independente da ordem
+        # em que as respostas chegaram.
+        corretas = 0
+        total = 0
+        for video_id in videos:
+            for question_id, question in questions.get(video_id, {}).items():
+                if question_id in answers:
+                    response = answers[question_id]
+                elif question_id in pending:
+                    try:
+                        result = pending[question_id].result()
+                    except Exception as e:
+                        # A pergunta fica fora do cache e será refeita na próxima execução.
+                        print(f"Pergunta {question_id} sem resposta: {e}")
+                        continue
+                    response = (result[question_id] if args.batch else result)["raw_response"]
+                else:
+                    continue
+                total += 1
+                response = utils.process_response(response)
+                print(f"Pergunta {question_id} - Resposta: {response}")
+                if response == question["answer"]:
+                    corretas += 1
+
+    if contexts:
+        contexts.close()
+
+    sink.close()
+    if not args.no_excel:
+        result_sink.export_excel(results_path, output(f"responses/responses_{model}.xlsx"))
     saveUploadedVideoIds(ids_gemini, ID_STORAGE_FILE)
     print(f"Total de perguntas: {total}")
     print(f"Total de respostas corretas: {corretas}")
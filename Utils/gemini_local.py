@@ -0,0 +1,183 @@
+"""
+Substituto local do cliente do Gemini (google.genai.Client) para testes.
+
+Implementa o subconjunto usado por gemini.py — `files`, `caches` e
+`models.generate_content` — sem rede e sem custo. Os arquivos passam por
+alguns estados PROCESSING antes de ficarem ACTIVE, os caches expiram pelo
+TTL e as respostas são determinísticas. Os contadores de tokens permitem
+comparar o custo de prefill com e sem cache de contexto.
+"""
+
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+TOKENS_POR_ARQUIVO = 30000
+
+
+class LocalApiError(Exception):
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def _parse_ttl(ttl) -> float:
+    if ttl is None:
+        return 3600.0
+    return float(str(ttl).rstrip("s"))
+
+
+def _answer_for(text: str) -> str:
+    """Letra determinística derivada do texto da pergunta."""
+    return "ABCD"[int(hashlib.sha256(text.encode("utf-8")).hexdigest(), 16) % 4]
+
+
+class LocalFiles:
+    def __init__(self, polls_until_active=2):
+        self.polls_until_active = polls_until_active
+        self.files = {}
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def upload(self, file):
+        with self.lock:
+            name = f"files/local-{next(self.counter)}"
+            self.files[name] = {"display_name": os.path.basename(file), "polls": 0}
+        return self._view(name)
+
+    def get(self, name):
+        with self.lock:
+            if name not in self.files:
+                raise LocalApiError(404, f"Arquivo '{name}' não encontrado.")
+            self.files[name]["polls"] += 1
+        return self._view(name)
+
+    def delete(self, name):
+        with self.lock:
+            self.files.pop(name, None)
+
+    def list(self):
+        return [self._view(name) for name in list(self.files)]
+
+    def _view(self, name):
+        entry = self.files[name]
+        state = "ACTIVE" if entry["polls"] >= self.polls_until_active else "PROCESSING"
+        return SimpleNamespace(
+            name=name, display_name=entry["display_name"], uri=f"local://{name}", state=SimpleNamespace(name=state)
+        )
+
+
+class LocalCaches:
+    def __init__(self):
+        self.caches = {}
+        self.counter = itertools.count(1)
+        self.lock = threading.Lock()
+        self.created = 0
+        self.deleted = 0
+
+    def create(self, model, config):
+        contents = list(getattr(config, "contents", None) or [])
+        with self.lock:
+            name = f"cachedContents/local-{next(self.counter)}"
+            self.caches[name] = {
+                "model": model,
+                "contents": contents,
+                "expire": time.monotonic() + _parse_ttl(getattr(config, "ttl", None)),
+            }
+            self.created += 1
+        return self._view(name)
+
+    def get(self, name):
+        with self.lock:
+            self._check(name)
+        return self._view(name)
+
+    def update(self, name, config):
+        with self.lock:
+            self._check(name)
+            self.caches[name]["expire"] = time.monotonic() + _parse_ttl(getattr(config, "ttl", None))
+        return self._view(name)
+
+    def delete(self, name):
+        with self.lock:
+            if self.caches.pop(name, None) is not None:
+                self.deleted += 1
+
+    def list(self):
+        return [self._view(name) for name in list(self.caches)]
+
+    def _check(self, name):
+        entry = self.caches.get(name)
+        if entry is None or entry["expire"] < time.monotonic():
+            self.caches.pop(name, None)
+            raise LocalApiError(404, f"Cache '{name}' não encontrado ou expirado.")
+
+    def _view(self, name):
+        entry = self.caches[name]
+        return SimpleNamespace(
+            name=name,
+            model=entry["model"],
+            usage_metadata=SimpleNamespace(total_token_count=TOKENS_POR_ARQUIVO * len(entry["contents"])),
+        )
+
+
+class LocalModels:
+    def __init__(self, caches, latency=0.0):
+        self.caches = caches
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.prefill_tokens = 0
+        self.cached_tokens = 0
+
+    def generate_content(self, model, contents, config=None):
+        if not isinstance(contents, (list, tuple)):
+            contents = [contents]
+        cached_tokens = 0
+        cached_content = getattr(config, "cached_content", None)
+        if cached_content:
+            with self.caches.lock:
+                self.caches._check(cached_content)
+                cached_tokens = TOKENS_POR_ARQUIVO * len(self.caches.caches[cached_content]["contents"])
+
+        text = "\n".join(item for item in contents if isinstance(item, str))
+        prompt_tokens = len(text) // 4 + TOKENS_POR_ARQUIVO * sum(not isinstance(item, str) for item in contents)
+        if self.latency:
+            time.sleep(self.latency)
+
+        with self.lock:
+            self.calls += 1
+            self.prefill_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+
+        if getattr(config, "response_schema", None) is not None:
+            blocks = re.split(r"^ID: (\S+)$", text, flags=re.MULTILINE)[1:]
+            answer = json.dumps([
+                {"question_id": question_id, "answer": _answer_for(block)}
+                for question_id, block in zip(blocks[0::2], blocks[1::2])
+            ])
+        else:
+            answer = _answer_for(text)
+
+        return SimpleNamespace(
+            text=answer,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=prompt_tokens + cached_tokens,
+                cached_content_token_count=cached_tokens,
+                total_token_count=prompt_tokens + cached_tokens + 1,
+            ),
+        )
+
+
+class LocalGeminiClient:
+    """Cliente local com a mesma interface usada de `genai.Client`."""
+
+    def __init__(self, latency=0.0, polls_until_active=2):
+        self.files = LocalFiles(polls_until_active)
+        self.caches = LocalCaches()
+        self.models = LocalModels(self.caches, latency)
@@ -5,77 +5,109 @@ import base64
 import time
 from openai import OpenAI
 import os
-import numpy as np # <<< ADICIONADO: Necessário para calcular os índices espaçados
+import numpy as np
+import frame_sampler
+import frame_store
+import keyframes
 
 # --- Configuração ---
 # <<< NOVO: Defina aqui a quantidade máxima de frames que você deseja enviar
 MAX_FRAMES = 200
 VIDEO_PATH = "downloads/videos/27.mp4"
+MODEL = "gpt-4.1-mini"
+# A API reduz o menor lado das imagens para 768px; os frames são guardados
+# nessa altura no arquivo mapeado em memória.
+FRAME_STORE_HEIGHT = 768
+# Qualidade JPEG (0-100) dos frames enviados; 95 é o padrão do OpenCV.
+JPEG_QUALITY = 95
+
+
+def create_client():
+    # Carrega a chave da API a partir de uma variável de ambiente
+    return OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "SUA_CHAVE_API_AQUI"))
 
-# --- Inicialização do Cliente OpenAI ---
-# Carrega a chave da API a partir de uma variável de ambiente
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "SUA_CHAVE_API_AQUI"))
 
 # --- Leitura e Processamento do Vídeo ---
-video = cv2.VideoCapture(VIDEO_PATH)
+def encode_frame(frame: np.ndarray, height: int | None = None, quality: int = JPEG_QUALITY) -> str:
+    """Redimensiona (opcional) um frame RGB e o codifica em JPEG/base64."""
+    if height is not None and frame.shape[0] > height:
+        width = max(1, int(round(frame.shape[1] * height / frame.shape[0])))
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    _, buffer = cv2.imencode(".jpg", cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return base64.b64encode(buffer).decode("utf-8")
 
-base64Frames = []
-while video.isOpened():
-    success, frame = video.read()
-    if not success:
-        break
-    _, buffer = cv2.imencode(".jpg", frame)
-    base64Frames.append(base64.b64encode(buffer).decode("utf-8"))
 
-video.release()
-total_frames_lidos = len(base64Frames)
-print(f"{total_frames_lidos} frames lidos do vídeo.")
+def stream_frames(video_path: str, max_frames: int = MAX_FRAMES, height: int | None = None, quality: int = JPEG_QUALITY):
+    """
+    Gera até `max_frames` frames igualmente espaçados já em JPEG/base64.
+    Os índices são calculados a partir do total de frames antes de ler o
+    vídeo, e só esses frames são decodificados e codificados: a memória
+    depende do número de frames pedidos, não da duração do vídeo.
+    """
+    total_frames, _ = frame_sampler.video_info(video_path)
+    if total_frames <= 0:
+        print(f"Não foi possível obter o número de frames de '{video_path}'.")
+        return
+    indices = frame_sampler.uniform_indices(total_frames, max_frames)
+    print(f"O vídeo tem {total_frames} frames. Selecionando {len(indices)}...")
+    for frame in frame_sampler.iter_frames(video_path, indices):
+        yield encode_frame(frame, height, quality)
 
-# --- Seleção dos Frames para Envio ---
-# <<< LÓGICA MODIFICADA: Seleciona os frames de forma inteligente
-if total_frames_lidos > MAX_FRAMES:
-    # Se o vídeo tem mais frames que o nosso limite, selecionamos MAX_FRAMES
-    # de forma espaçada para representar o vídeo todo.
-    print(f"O vídeo tem mais de {MAX_FRAMES} frames. Selecionando uma amostra espaçada...")
-    indices = np.linspace(0, total_frames_lidos - 1, MAX_FRAMES, dtype=int)
-    frames_para_enviar = [base64Frames[i] for i in indices]
-else:
-    # Se o vídeo tem menos frames que o limite, enviamos todos.
-    print(f"O vídeo tem {total_frames_lidos} frames, enviando todos.")
-    frames_para_enviar = base64Frames
 
-print(f"Enviando {len(frames_para_enviar)} frames para a análise.")
+def load_frames(video_path: str, max_frames: int = MAX_FRAMES, height: int | None = None,
+                quality: int = JPEG_QUALITY, use_store: bool = True, sampling: str = "uniform") -> list[str]:
+    """
+    Amostra até `max_frames` frames e os codifica em JPEG/base64: igualmente
+    espaçados ou, com `sampling="shots"`, divididos entre as cenas do vídeo.
+    Com `use_store`, os frames vêm do arquivo mapeado em memória
+    (decodificado uma vez por vídeo e altura); sem ele, direto do vídeo por
+    `stream_frames` (só amostragem uniforme).
+    """
+    if use_store or sampling == "shots":
+        store = frame_store.FrameStore(video_path, height=height or FRAME_STORE_HEIGHT)
+        if sampling == "shots":
+            sampler = keyframes.ShotSampler(max_frames)
+        else:
+            sampler = frame_sampler.UniformSampler(max_frames)
+        frames, _, _ = store.sample(sampler)
+        base64Frames = [encode_frame(frame, quality=quality) for frame in frames]
+    else:
+        base64Frames = list(stream_frames(video_path, max_frames, height, quality))
+    print(f"{len(base64Frames)} frames amostrados do vídeo.")
+    return base64Frames
 
-# --- Chamada para a API da OpenAI ---
-# NOTA: A estrutura da sua chamada de API parece ser de uma versão mais antiga ou customizada.
-# A estrutura abaixo foi adaptada para a versão mais comum da biblioteca 'openai' (v1.x+).
-# Se a sua estrutura original funciona, sinta-se à vontade para usá-la, apenas trocando
-# 'base64Frames[0::60]' por 'frames_para_enviar'.
 
-# Construindo a lista de mensagens para a API
-response = client.responses.create(
-    model="gpt-4.1-mini",
-    input=[
-        {
-            "role": "user",
-            "content": [
-                {
-                    "type": "input_text",
-                    "text": (
-                        "These are frames from a video that I want to upload. Generate a compelling description that I can upload along with the video."
-                    )
-                },
-                *[
-                    {
-                        "type": "input_image",
-                        "image_url": f"data:image/jpeg;base64,{frame}"
-                    }
-                    for frame in base64Frames[0::60]
+# --- Chamada para a API da OpenAI ---
+def ask(frames: list[str], prompt: str, client=None, model: str = MODEL) -> str:
+    """Envia os frames selecionados e o prompt para a API de respostas da OpenAI."""
+    client = client or create_client()
+    response = client.responses.create(
+        model=model,
+        input=[
+            {
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": prompt},
+                    *[
+                        {
+                            "type": "input_image",
+                            "image_url": f"data:image/jpeg;base64,{frame}"
+                        }
+                        for frame in frames
+                    ]
                 ]
-            ]
-        }
-    ],
-)
+            }
+        ],
+    )
+    return response.output_text
+
 
-print("\n--- Descrição Gerada ---")
-print(response.choices[0].message.content)
\ No newline at end of file
+if __name__ == "__main__":
+    frames_para_enviar = list(stream_frames(VIDEO_PATH, MAX_FRAMES, FRAME_STORE_HEIGHT))
+    print(f"Enviando {len(frames_para_enviar)} frames para a análise.")
+    descricao = ask(
+        frames_para_enviar,
+        "These are frames from a video that I want to upload. Generate a compelling description that I can upload along with the video.",
+    )
+    print("\n--- Descrição Gerada ---")
+    print(descricao)
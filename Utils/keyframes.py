@@ -0,0 +1,157 @@
+"""
+Seleção de frames-chave guiada por mudanças de cena.
+
+A amostragem uniforme gasta frames em planos estáticos (entrevistas) e
+perde eventos curtos (esportes, humor). Aqui cada frame do `FrameStore`
+vira uma miniatura e um histograma HSV, calculados em lote com numpy; um
+corte de cena é marcado onde o histograma ou os pixels mudam bruscamente.
+O orçamento de frames é então dividido entre as cenas e frames quase
+iguais são descartados.
+
+    store = frame_store.FrameStore(video_path, height=384)
+    frames, timestamps, duration = store.sample(keyframes.ShotSampler(16))
+"""
+
+import json
+import os
+
+import numpy as np
+
+SHOTS_VERSION = 1
+THUMB_SIZE = 32
+HUE_BINS, SAT_BINS, VALUE_BINS = 8, 4, 4
+# Distância entre histogramas (0 a 1) acima da qual há um corte de cena.
+HIST_THRESHOLD = 0.4
+# Diferença média de pixels (0 a 255) acima da qual há um corte de cena.
+PIXEL_THRESHOLD = 40.0
+# Diferença média de pixels abaixo da qual dois frames escolhidos são duplicados.
+DUPLICATE_THRESHOLD = 6.0
+
+
+def thumbnails(frames: np.ndarray, size: int = THUMB_SIZE, batch_size: int = 256) -> np.ndarray:
+    """Miniaturas (N, size, size, 3) por subamostragem, lendo `frames` em lotes."""
+    n, height, width = frames.shape[:3]
+    rows = np.linspace(0, height - 1, size).astype(int)
+    cols = np.linspace(0, width - 1, size).astype(int)
+    thumbs = np.empty((n, size, size, 3), dtype=np.uint8)
+    for start in range(0, n, batch_size):
+        thumbs[start:start + batch_size] = frames[start:start + batch_size][:, rows][:, :, cols]
+    return thumbs
+
+
+def hsv_histograms(thumbs: np.ndarray) -> np.ndarray:
+    """Histogramas HSV normalizados (N, HUE_BINS*SAT_BINS*VALUE_BINS) de frames RGB."""
+    rgb = thumbs.astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    delta = value - rgb.min(axis=-1)
+    saturation = np.where(value > 0, delta / np.maximum(value, 1e-6), 0.0)
+    safe = np.maximum(delta, 1e-6)
+    hue = np.select(
+        [value == r, value == g],
+        [((g - b) / safe) % 6, (b - r) / safe + 2],
+        (r - g) / safe + 4,
+    ) / 6.0
+    hue = np.where(delta > 0, hue, 0.0)
+
+    codes = (
+        np.minimum((hue * HUE_BINS).astype(int), HUE_BINS - 1) * SAT_BINS * VALUE_BINS
+        + np.minimum((saturation * SAT_BINS).astype(int), SAT_BINS - 1) * VALUE_BINS
+        + np.minimum((value * VALUE_BINS).astype(int), VALUE_BINS - 1)
+    ).reshape(len(thumbs), -1)
+    bins = HUE_BINS * SAT_BINS * VALUE_BINS
+    offsets = np.arange(len(thumbs))[:, None] * bins
+    counts = np.bincount((codes + offsets).ravel(), minlength=len(thumbs) * bins)
+    return counts.reshape(len(thumbs), bins) / codes.shape[1]
+
+
+def pixel_distances(thumbs: np.ndarray, positions: np.ndarray | None = None) -> np.ndarray:
+    """Diferença média absoluta entre frames consecutivos (ou entre `positions` consecutivas)."""
+    selected = thumbs if positions is None else thumbs[positions]
+    return np.abs(np.diff(selected.astype(np.int16), axis=0)).mean(axis=(1, 2, 3))
+
+
+def detect_shots(thumbs: np.ndarray, hist_threshold: float = HIST_THRESHOLD,
+                 pixel_threshold: float = PIXEL_THRESHOLD) -> np.ndarray:
+    """Posições onde cada cena começa (sempre inclui 0)."""
+    if len(thumbs) < 2:
+        return np.zeros(min(1, len(thumbs)), dtype=int)
+    histograms = hsv_histograms(thumbs)
+    hist_distance = np.abs(np.diff(histograms, axis=0)).sum(axis=1) / 2
+    cuts = (hist_distance > hist_threshold) | (pixel_distances(thumbs) > pixel_threshold)
+    return np.concatenate([[0], np.flatnonzero(cuts) + 1])
+
+
+def allocate_budget(starts: np.ndarray, total: int, budget: int) -> np.ndarray:
+    """
+    Frames por cena: proporcional à duração, com pelo menos um por cena.
+    Com mais cenas que orçamento, só as `budget` cenas mais longas recebem.
+    """
+    lengths = np.diff(np.append(starts, total))
+    counts = np.zeros(len(starts), dtype=int)
+    if budget < len(starts):
+        counts[np.argsort(-lengths, kind="stable")[:budget]] = 1
+        return counts
+    counts[:] = 1
+    share = (budget - len(starts)) * lengths / lengths.sum()
+    counts += share.astype(int)
+    # Distribui o que sobrou do arredondamento pelas maiores frações.
+    rest = budget - counts.sum()
+    counts[np.argsort(-(share - share.astype(int)), kind="stable")[:rest]] += 1
+    return np.minimum(counts, lengths)
+
+
+def select_keyframes(thumbs: np.ndarray, starts: np.ndarray, budget: int,
+                     duplicate_threshold: float = DUPLICATE_THRESHOLD) -> np.ndarray:
+    """Posições escolhidas: espaçadas dentro de cada cena, sem quase-duplicados."""
+    total = len(thumbs)
+    ends = np.append(starts[1:], total)
+    positions = []
+    for start, end, count in zip(starts, ends, allocate_budget(starts, total, budget)):
+        if count:
+            # Centro de `count` fatias iguais da cena.
+            positions.extend(start + ((np.arange(count) + 0.5) * (end - start) / count).astype(int))
+    positions = np.array(positions, dtype=int)
+
+    kept = [positions[0]] if len(positions) else []
+    for position in positions[1:]:
+        if pixel_distances(thumbs, np.array([kept[-1], position]))[0] >= duplicate_threshold:
+            kept.append(position)
+    return np.array(kept, dtype=int)
+
+
+def shot_index(store, hist_threshold: float = HIST_THRESHOLD, pixel_threshold: float = PIXEL_THRESHOLD) -> np.ndarray:
+    """Início de cada cena do `FrameStore`, gravado ao lado do índice dele."""
+    path = store.index_path.replace(".json", "_shots.json")
+    params = {"version": SHOTS_VERSION, "hist_threshold": hist_threshold, "pixel_threshold": pixel_threshold}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            cached = json.load(file)
+        if cached.get("params") == params:
+            return np.asarray(cached["starts"], dtype=int)
+
+    starts = detect_shots(thumbnails(store.frames), hist_threshold, pixel_threshold)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump({"params": params, "starts": starts.tolist()}, file)
+    os.replace(f"{path}.tmp", path)
+    return starts
+
+
+class ShotSampler:
+    """
+    Estratégia para `FrameStore.sample`: até `num_frames` frames divididos
+    entre as cenas do vídeo, sem quase-duplicados.
+    """
+
+    name = "shots"
+
+    def __init__(self, num_frames: int, duplicate_threshold: float = DUPLICATE_THRESHOLD):
+        self.num_frames = num_frames
+        self.duplicate_threshold = duplicate_threshold
+
+    def params(self) -> dict:
+        return {"num_frames": self.num_frames, "duplicate_threshold": self.duplicate_threshold}
+
+    def positions(self, store) -> np.ndarray:
+        starts = shot_index(store)
+        return select_keyframes(thumbnails(store.frames), starts, self.num_frames, self.duplicate_threshold)
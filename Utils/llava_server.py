@@ -0,0 +1,232 @@
+"""
+Servidor local de inferência do LLaVA-Video.
+
+O modelo é carregado uma única vez e atende pedidos por um socket local
+(multiprocessing.connection). As perguntas que chegam enquanto o modelo está
+ocupado são agrupadas em uma única chamada a `model.generate`, com padding,
+e cada vídeo é preparado uma vez para todas as perguntas dele.
+
+Uso:
+    python llava_server.py --model lmms-lab/LLaVA-Video-7B-Qwen2
+    python llava_server.py --model lmms-lab/llava-onevision-qwen2-0.5b-ov --device cpu   # teste sem GPU
+    python runner.py --backend llava --llava-server 127.0.0.1:6001 --max-requests 8
+
+O cliente se autentica com LLAVA_SERVER_KEY ou com a chave que o servidor
+grava em ~/.cache/besim/llava_server.key (só o dono lê); em outra máquina,
+defina LLAVA_SERVER_KEY igual nos dois lados.
+"""
+
+import argparse
+import logging
+import os
+import queue
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6001)
+# Chave compartilhada entre cliente e servidor. As mensagens são objetos
+# pickle, então quem conhece a chave executa código no servidor: ela vem de
+# LLAVA_SERVER_KEY ou de um arquivo aleatório legível só pelo dono.
+KEY_FILE = os.path.expanduser("~/.cache/besim/llava_server.key")
+
+
+def load_authkey(create: bool = False) -> bytes:
+    """Chave de LLAVA_SERVER_KEY ou de KEY_FILE; com `create`, o servidor gera o arquivo se faltar."""
+    key = os.environ.get("LLAVA_SERVER_KEY")
+    if key:
+        return key.encode("utf-8")
+    if create and not os.path.exists(KEY_FILE):
+        os.makedirs(os.path.dirname(KEY_FILE), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                file.write(secrets.token_hex(32))
+            logging.info(f"Chave do servidor gerada em '{KEY_FILE}'.")
+    try:
+        with open(KEY_FILE, "r", encoding="utf-8") as file:
+            return file.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"Sem chave do servidor do LLaVA: defina LLAVA_SERVER_KEY ou inicie o llava_server.py, que cria '{KEY_FILE}'."
+        ) from None
+
+
+def parse_address(text: str):
+    """"host:porta" vira uma tupla; qualquer outro texto é o caminho de um socket Unix."""
+    host, sep, port = text.rpartition(":")
+    if sep and port.isdigit():
+        return host or DEFAULT_ADDRESS[0], int(port)
+    return text
+
+
+class LlavaEngine:
+    """Modelo carregado uma vez, com os vídeos preparados recentemente em memória."""
+
+    def __init__(self, pretrained: str, device: str | None = None, max_new_tokens: int = 4096, max_videos: int = 4):
+        import llava_video
+
+        self.llava = llava_video
+        # Sem `device`, cuda se houver GPU, senão cpu.
+        self.device = device or llava_video.device
+        self.max_new_tokens = max_new_tokens
+        inicio = time.perf_counter()
+        self.tokenizer, self.model, self.image_processor = llava_video.load_model(pretrained, device=self.device)
+        logging.info(f"Modelo '{pretrained}' carregado em {time.perf_counter() - inicio:.1f}s.")
+        self.videos = OrderedDict()
+        self.max_videos = max_videos
+
+    def prepare(self, video_path: str, max_frames: int, sampling: str):
+        key = (video_path, max_frames, sampling)
+        if key in self.videos:
+            self.videos.move_to_end(key)
+            return self.videos[key]
+        prepared = self.llava.prepare_video(video_path, self.image_processor, max_frames, self.device, sampling=sampling)
+        self.videos[key] = prepared
+        while len(self.videos) > self.max_videos:
+            self.videos.popitem(last=False)
+        return prepared
+
+    def generate(self, requests: list) -> list:
+        prepared = [self.prepare(r["video_path"], r["max_frames"], r["sampling"]) for r in requests]
+        return self.llava.generate_batch(
+            self.tokenizer, self.model,
+            [video for video, _ in prepared], [instruction for _, instruction in prepared],
+            [r["question"] for r in requests], self.device, self.max_new_tokens,
+        )
+
+
+class InferenceServer:
+    """
+    Recebe pedidos de várias conexões e os executa em lotes de até
+    `max_batch`. Depois do primeiro pedido, espera até `batch_wait`
+    segundos por outros antes de chamar o modelo.
+    """
+
+    def __init__(self, engine, address=DEFAULT_ADDRESS, max_batch: int = 8, batch_wait: float = 0.05):
+        self.engine = engine
+        self.address = address
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.pending = queue.Queue()
+        self.listener = None
+        self.stopped = threading.Event()
+
+    def serve_forever(self):
+        self.listener = Listener(self.address, backlog=64, authkey=load_authkey(create=True))
+        logging.info(f"Servidor do LLaVA ouvindo em {self.listener.address}.")
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        while not self.stopped.is_set():
+            try:
+                connection = self.listener.accept()
+            except AuthenticationError:
+                logging.warning("Conexão recusada: chave de autenticação inválida.")
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def close(self):
+        self.stopped.set()
+        if self.listener:
+            self.listener.close()
+
+    def _handle(self, connection):
+        """Atende uma conexão: cada mensagem é um pedido, respondido na ordem."""
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except (EOFError, OSError):
+                    return
+                done = threading.Event()
+                slot = {"request": request, "done": done}
+                self.pending.put(slot)
+                done.wait()
+                connection.send(slot["reply"])
+
+    def _batch_loop(self):
+        while not self.stopped.is_set():
+            batch = [self.pending.get()]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.pending.get(timeout=max(0.0, remaining)) if remaining > 0 else self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch):
+        inicio = time.perf_counter()
+        try:
+            answers = self.engine.generate([slot["request"] for slot in batch])
+            replies = [{"ok": True, "answer": answer} for answer in answers]
+        except Exception as e:
+            logging.error(f"Falha em um lote de {len(batch)} perguntas: {e}")
+            replies = [{"ok": False, "error": str(e)} for _ in batch]
+        logging.info(f"Lote de {len(batch)} pergunta(s) em {time.perf_counter() - inicio:.2f}s.")
+        for slot, reply in zip(batch, replies):
+            slot["reply"] = reply
+            slot["done"].set()
+
+
+class LlavaClient:
+    """Cliente do servidor; seguro para várias threads (uma conexão por thread)."""
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.local = threading.local()
+        self.authkey = load_authkey()
+
+    def _connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = Client(self.address, authkey=self.authkey)
+        return self.local.connection
+
+    def ask(self, video_path: str, question: str, max_frames: int = 64, sampling: str = "uniform") -> str:
+        connection = self._connection()
+        try:
+            connection.send({
+                "video_path": os.path.abspath(video_path), "question": question,
+                "max_frames": max_frames, "sampling": sampling,
+            })
+            reply = connection.recv()
+        except (EOFError, OSError):
+            self.local.connection = None
+            raise ConnectionError(f"Conexão com o servidor do LLaVA em {self.address} perdida.")
+        if not reply["ok"]:
+            raise RuntimeError(f"Erro no servidor do LLaVA: {reply['error']}")
+        return reply["answer"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de inferência do LLaVA-Video.")
+    parser.add_argument("--model", default="lmms-lab/LLaVA-Video-7B-Qwen2", help="Checkpoint do LLaVA.")
+    parser.add_argument("--device", default=None, help="cuda ou cpu (use um checkpoint pequeno na CPU). Padrão: cuda se houver GPU.")
+    parser.add_argument("--address", default=f"{DEFAULT_ADDRESS[0]}:{DEFAULT_ADDRESS[1]}",
+                        help="host:porta ou caminho de um socket Unix.")
+    parser.add_argument("--max-batch", type=int, default=8, help="Perguntas por chamada a model.generate.")
+    parser.add_argument("--batch-wait", type=float, default=0.05, help="Espera (s) por mais perguntas antes de gerar.")
+    parser.add_argument("--max-new-tokens", type=int, default=4096, help="Tokens gerados por resposta.")
+    args = parser.parse_args()
+
+    engine = LlavaEngine(args.model, args.device, args.max_new_tokens)
+    server = InferenceServer(engine, parse_address(args.address), args.max_batch, args.batch_wait)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServidor encerrado.")
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    main()
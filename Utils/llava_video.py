@@ -0,0 +1,240 @@
+# pip install git+https://github.com/LLaVA-VL/LLaVA-NeXT.git
+import llava
+from llava.model.builder import load_pretrained_model
+from llava.mm_utils import get_model_name_from_path, process_images, tokenizer_image_token
+from llava.constants import IMAGE_TOKEN_INDEX, DEFAULT_IMAGE_TOKEN, DEFAULT_IM_START_TOKEN, DEFAULT_IM_END_TOKEN, IGNORE_INDEX
+from llava.conversation import conv_templates, SeparatorStyle
+from PIL import Image
+import requests
+import copy
+import torch
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+from transformers import DynamicCache, GenerationMixin
+import sys
+import warnings
+import numpy as np
+import frame_sampler
+import frame_store
+import keyframes
+warnings.filterwarnings("ignore")
+# O processador de imagem do SigLIP redimensiona para 384x384; guardar os
+# frames nessa altura reduz o arquivo mapeado sem perder detalhe.
+FRAME_STORE_HEIGHT = 384
+def load_video(video_path, max_frames_num,fps=1,force_sample=False,sampling="uniform",decoder_threads=frame_sampler.DECODER_THREADS):
+    if max_frames_num == 0:
+        return np.zeros((1, 336, 336, 3))
+    if sampling == "shots":
+        sampler = keyframes.ShotSampler(max_frames_num)
+    elif force_sample:
+        sampler = frame_sampler.UniformSampler(max_frames_num)
+    else:
+        sampler = frame_sampler.FpsSampler(fps, max_frames=max_frames_num)
+    store = frame_store.FrameStore(video_path, height=FRAME_STORE_HEIGHT, decoder_threads=decoder_threads)
+    spare_frames, timestamps, video_time = store.sample(sampler)
+    frame_time = ",".join(np.char.add(np.char.mod("%.2f", timestamps), "s"))
+    return spare_frames,frame_time,video_time
+pretrained = "lmms-lab/LLaVA-Video-72B-Qwen2"
+model_name = "llava_qwen"
+# Sem GPU visível tudo roda na CPU (só viável com checkpoints pequenos).
+device = "cuda" if torch.cuda.is_available() else "cpu"
+conv_template = "qwen_1_5"  # Make sure you use correct chat template for different models
+def load_model(pretrained=pretrained, model_name=model_name, device=device):
+    # Os pesos em safetensors são mapeados em memória pelo from_pretrained.
+    # Na CPU não há flash-attention; o SDPA do PyTorch funciona nos dois casos.
+    if str(device) != "cpu":
+        tokenizer, model, image_processor, max_length = load_pretrained_model(pretrained, None, model_name, torch_dtype="bfloat16", device_map="auto", attn_implementation="flash_attention_2")  # Add any other thing you want to pass in llava_model_args
+    else:
+        # O builder do LLaVA-NeXT move a vision tower para cuda/float16 sempre
+        # que device_map != "auto". Sem GPU, "auto" já põe tudo na CPU; com GPU
+        # o mapa explícito é necessário e a vision tower é trazida de volta.
+        device_map = {"": "cpu"} if torch.cuda.is_available() else "auto"
+        tokenizer, model, image_processor, max_length = load_pretrained_model(pretrained, None, model_name, torch_dtype="bfloat16", device_map=device_map, attn_implementation="sdpa")
+        model.get_vision_tower().to(device="cpu", dtype=torch.bfloat16)
+    model.eval()
+    return tokenizer, model, image_processor
+def decode_video(video_path, image_processor, max_frames_num=64, sampling="uniform", decoder_threads=frame_sampler.DECODER_THREADS):
+    """Decodifica e pré-processa na CPU; devolve o tensor bfloat16 e a time_instruciton."""
+    video,frame_time,video_time = load_video(video_path, max_frames_num, 1, force_sample=True, sampling=sampling, decoder_threads=decoder_threads)
+    video = image_processor.preprocess(video, return_tensors="pt")["pixel_values"].bfloat16()
+    return video, build_time_instruction(video_time, len(video), frame_time, sampling)
+def build_time_instruction(video_time, num_frames, frame_time, sampling="uniform"):
+    how = "sampled across its shots" if sampling == "shots" else "uniformly sampled"
+    return f"The video lasts for {video_time:.2f} seconds, and {num_frames} frames are {how} from it. These frames are located at {frame_time}.Please answer the following questions related to this video."
+def decode_video_budgets(video_path, image_processor, budgets, decoder_threads=frame_sampler.DECODER_THREADS):
+    """
+    Para a varredura de número de frames: decodifica e pré-processa uma vez a
+    maior amostra uniforme e deriva as menores escolhendo índices dela.
+    Devolve {budget: (tensor bfloat16 na CPU, time_instruciton)}.
+    """
+    store = frame_store.FrameStore(video_path, height=FRAME_STORE_HEIGHT, decoder_threads=decoder_threads)
+    frames, timestamps, video_time = store.sample(frame_sampler.UniformSampler(max(budgets)))
+    pixels = image_processor.preprocess(frames, return_tensors="pt")["pixel_values"].bfloat16()
+    prepared = {}
+    for budget in sorted(budgets):
+        positions = frame_sampler.uniform_indices(len(pixels), budget)
+        frame_time = ",".join(np.char.add(np.char.mod("%.2f", timestamps[positions]), "s"))
+        prepared[budget] = pixels[torch.as_tensor(positions)], build_time_instruction(video_time, len(positions), frame_time)
+    return prepared
+def prepare_video(video_path, image_processor, max_frames_num=64, device=device, sampling="uniform", decoder_threads=frame_sampler.DECODER_THREADS):
+    video, time_instruciton = decode_video(video_path, image_processor, max_frames_num, sampling, decoder_threads)
+    return [video.to(device)], time_instruciton
+class VideoPrefetcher:
+    """
+    Decodifica e pré-processa os próximos vídeos em threads enquanto o modelo
+    gera as respostas do vídeo atual. No máximo `depth` vídeos ficam prontos
+    (ou em preparo) na fila; `get` devolve o resultado de `prepare_video`.
+    """
+    def __init__(self, image_processor, max_frames_num=64, device=device, sampling="uniform", workers=2, depth=4, decoder_threads=4):
+        self.image_processor = image_processor
+        self.max_frames_num = max_frames_num
+        self.device = device
+        self.sampling = sampling
+        self.decoder_threads = decoder_threads
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llava-prefetch")
+        self.slots = threading.BoundedSemaphore(depth)
+        self.ready = queue.Queue()
+        self.futures = {}
+        self.claimed = set()
+        self.closed = False
+        self.lock = threading.Lock()
+    def _decode(self, video_path):
+        video, time_instruciton = decode_video(video_path, self.image_processor, self.max_frames_num, self.sampling, self.decoder_threads)
+        # Memória fixada permite copiar para a GPU sem bloquear a geração.
+        if str(self.device).startswith("cuda"):
+            video = video.pin_memory()
+        return video, time_instruciton
+    def _feed(self, video_paths):
+        for video_path in video_paths:
+            self.slots.acquire()
+            with self.lock:
+                if self.closed:
+                    self.slots.release()
+                    break
+                # Já enviado, ou já pedido por `get` antes de chegar a vez dele.
+                if video_path in self.futures or video_path in self.claimed:
+                    self.slots.release()
+                    continue
+                self.futures[video_path] = self.executor.submit(self._decode, video_path)
+            self.ready.put(video_path)
+        self.ready.put(None)
+    def start(self, video_paths):
+        """Começa a preparar os vídeos na ordem dada, sem bloquear."""
+        threading.Thread(target=self._feed, args=(list(dict.fromkeys(video_paths)),), daemon=True).start()
+        return self
+    def get(self, video_path):
+        """Espera o vídeo ficar pronto; vídeos fora da lista são preparados na hora."""
+        with self.lock:
+            future = self.futures.pop(video_path, None)
+            if future is None:
+                self.claimed.add(video_path)
+        if future is None:
+            return prepare_video(video_path, self.image_processor, self.max_frames_num, self.device, self.sampling, self.decoder_threads)
+        try:
+            video, time_instruciton = future.result()
+        finally:
+            self.slots.release()
+        return [video.to(self.device, non_blocking=True)], time_instruciton
+    def __iter__(self):
+        """Percorre os vídeos de `start` em ordem: (caminho, video, time_instruciton)."""
+        while (video_path := self.ready.get()) is not None:
+            video, time_instruciton = self.get(video_path)
+            yield video_path, video, time_instruciton
+    def close(self):
+        """Cancela os vídeos que ninguém pediu e devolve as vagas deles."""
+        with self.lock:
+            self.closed = True
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.cancel()
+            self.slots.release()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+def build_prompt(time_instruciton, question_text):
+    question = DEFAULT_IMAGE_TOKEN + f"\n{time_instruciton}\n{question_text}"
+    conv = copy.deepcopy(conv_templates[conv_template])
+    conv.append_message(conv.roles[0], question)
+    conv.append_message(conv.roles[1], None)
+    return conv.get_prompt()
+def build_input_ids(tokenizer, time_instruciton, question_text):
+    prompt_question = build_prompt(time_instruciton, question_text)
+    return tokenizer_image_token(prompt_question, tokenizer, IMAGE_TOKEN_INDEX, return_tensors="pt")
+def generate(tokenizer, model, video, time_instruciton, question_text, device=device, max_new_tokens=4096):
+    input_ids = build_input_ids(tokenizer, time_instruciton, question_text).unsqueeze(0).to(device)
+    cont = model.generate(
+        input_ids,
+        images=video,
+        modalities= ["video"],
+        do_sample=False,
+        temperature=0,
+        max_new_tokens=max_new_tokens,
+    )
+    return tokenizer.batch_decode(cont, skip_special_tokens=True)[0].strip()
+def generate_batch(tokenizer, model, videos, time_instrucitons, question_texts, device=device, max_new_tokens=4096):
+    """Responde várias perguntas (cada uma com seu vídeo) em uma única chamada a model.generate."""
+    prompts = [build_input_ids(tokenizer, t, q) for t, q in zip(time_instrucitons, question_texts)]
+    width = max(len(ids) for ids in prompts)
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    input_ids = torch.full((len(prompts), width), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(prompts), width), dtype=torch.long)
+    # Padding à esquerda: todas as sequências terminam no mesmo ponto e a geração continua alinhada.
+    for i, ids in enumerate(prompts):
+        input_ids[i, width - len(ids):] = ids
+        attention_mask[i, width - len(ids):] = 1
+    model.config.tokenizer_padding_side = "left"
+    cont = model.generate(
+        input_ids.to(device),
+        attention_mask=attention_mask.to(device),
+        images=[video[0] if isinstance(video, list) else video for video in videos],
+        modalities=["video"] * len(prompts),
+        do_sample=False,
+        temperature=0,
+        max_new_tokens=max_new_tokens,
+        pad_token_id=pad_token_id,
+    )
+    return [text.strip() for text in tokenizer.batch_decode(cont, skip_special_tokens=True)]
+# --- Prefill compartilhado (vídeo + time_instruciton) entre as perguntas de um vídeo ---
+# Marcador que separa, no prompt do template, o prefixo comum da pergunta.
+QUESTION_SENTINEL = "\ue000"
+@torch.inference_mode()
+def prepare_prefix(tokenizer, model, video, time_instruciton, device=device):
+    """
+    Faz uma vez o prefill da parte do prompt que não depende da pergunta.
+    O resultado (embeddings e past_key_values na GPU) serve às perguntas de
+    uma chamada e deve ser descartado depois dela.
+    """
+    prefix_text, suffix_template = build_prompt(time_instruciton, QUESTION_SENTINEL).split(QUESTION_SENTINEL)
+    prefix_ids = tokenizer_image_token(prefix_text, tokenizer, IMAGE_TOKEN_INDEX, return_tensors="pt").unsqueeze(0).to(device)
+    _, _, _, _, prefix_embeds, _ = model.prepare_inputs_labels_for_multimodal(
+        prefix_ids, None, None, None, None, video, modalities=["video"]
+    )
+    past_key_values = model(inputs_embeds=prefix_embeds, use_cache=True, past_key_values=DynamicCache()).past_key_values
+    return {"embeds": prefix_embeds, "past_key_values": past_key_values, "suffix_template": suffix_template}
+@torch.inference_mode()
+def generate_with_prefix(tokenizer, model, prefix, question_text, device=device, max_new_tokens=4096):
+    """Gera a resposta reaproveitando os past_key_values do prefixo (copiados, pois a geração os altera)."""
+    suffix_ids = tokenizer(question_text + prefix["suffix_template"], add_special_tokens=False, return_tensors="pt").input_ids.to(device)
+    inputs_embeds = torch.cat([prefix["embeds"], model.get_model().embed_tokens(suffix_ids)], dim=1)
+    attention_mask = torch.ones(inputs_embeds.shape[:2], dtype=torch.long, device=inputs_embeds.device)
+    # O generate do LLaVA não aceita inputs_embeds; o do transformers sim, e
+    # com o cache só processa os embeddings que ainda não estão nele.
+    cont = GenerationMixin.generate(
+        model,
+        inputs_embeds=inputs_embeds,
+        attention_mask=attention_mask,
+        past_key_values=copy.deepcopy(prefix["past_key_values"]),
+        do_sample=False,
+        max_new_tokens=max_new_tokens,
+        pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+    )
+    return tokenizer.batch_decode(cont, skip_special_tokens=True)[0].strip()
+if __name__ == "__main__":
+    tokenizer, model, image_processor = load_model()
+    video_paths = sys.argv[1:] or ["downloads/videos/27.mp4"]
+    max_frames_num = 64
+    # O próximo vídeo é decodificado enquanto o modelo descreve o atual.
+    prefetcher = VideoPrefetcher(image_processor, max_frames_num).start(video_paths)
+    for video_path, video, time_instruciton in prefetcher:
+        text_outputs = generate(tokenizer, model, video, time_instruciton, "Please describe this video in detail.")
+        print(video_path, text_outputs)
+    prefetcher.close()
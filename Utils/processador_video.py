@@ -9,10 +9,12 @@ e cria uma "tirinha" de imagens a partir de um arquivo de vídeo.
 
 Uso:
     python processador_video.py /caminho/para/seu/video.mp4
+    python processador_video.py /caminho/para/pasta_de_videos --max-tarefas 8
 
 Pré-requisitos:
     - Python 3.8+
-    - Bibliotecas: pip install opencv-python-headless moviepy Pillow google-generativeai
+    - Bibliotecas: pip install opencv-python-headless Pillow google-generativeai
+    - ffmpeg e ffprobe no PATH (extração e divisão do áudio).
     - Chave de API do Gemini configurada na variável de ambiente GOOGLE_API_KEY.
 """
 
@@ -21,25 +23,81 @@ import sys
 import argparse
 import cv2
 import time
-from moviepy import VideoFileClip
-from PIL import Image
-import google.generativeai as genai
+import queue
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from PIL import Image, ImageDraw
+import frame_sampler
+import transcricao
 
 # --- Configurações ---
 # Use um valor inteiro (ex: 2 para 2 frames/seg) ou fracionário
 # (ex: 0.5 para 1 frame a cada 2 segundos).
 FRAMES_POR_SEGUNDO = 1
+# Threads que codificam/gravam os JPEGs e tamanho máximo da fila entre a
+# decodificação e a gravação (limita a memória usada por frames pendentes).
+ESCRITORES_JPEG = 4
+TAMANHO_FILA_FRAMES = 64
 
 # --- Funções Modulares ---
 
-def extrair_frames(caminho_video: str, pasta_saida: str, fps_extracao: float) -> int:
+# Intervalo (em frames) a partir do qual o modo "auto" busca diretamente o
+# próximo frame em vez de decodificar e descartar os intermediários.
+LIMIAR_BUSCA_FRAMES = frame_sampler.SEEK_THRESHOLD
+
+# Os índices seguem a mesma estratégia de FPS usada pelos modelos.
+_indices_alvo = frame_sampler.fps_indices
+
+class GravadorFrames:
+    """
+    Grava frames como `frame_XXXX.jpg` em threads separadas. A decodificação
+    só bloqueia quando a fila (limitada) está cheia; `cv2.imwrite` libera o
+    GIL, então a codificação JPEG roda em paralelo com a decodificação.
+    """
+
+    def __init__(self, pasta_saida: str, escritores: int = ESCRITORES_JPEG, tamanho_fila: int = TAMANHO_FILA_FRAMES):
+        self.pasta_saida = pasta_saida
+        self.fila = queue.Queue(maxsize=tamanho_fila)
+        self.erros = []
+        self.threads = [threading.Thread(target=self._escrever, daemon=True) for _ in range(escritores)]
+        for thread in self.threads:
+            thread.start()
+
+    def _escrever(self):
+        while True:
+            item = self.fila.get()
+            if item is None:
+                return
+            numero, frame = item
+            nome_arquivo_frame = os.path.join(self.pasta_saida, f"frame_{numero:04d}.jpg")
+            if not cv2.imwrite(nome_arquivo_frame, frame):
+                self.erros.append(nome_arquivo_frame)
+
+    def salvar(self, numero: int, frame):
+        self.fila.put((numero, frame))
+
+    def fechar(self):
+        for _ in self.threads:
+            self.fila.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.erros:
+            raise IOError(f"Falha ao gravar {len(self.erros)} frames (ex: '{self.erros[0]}').")
+
+def extrair_frames(caminho_video: str, pasta_saida: str, fps_extracao: float, modo: str = "auto") -> int:
     """
     Extrai frames de um vídeo a uma taxa especificada e os salva como imagens.
 
+    Só os frames que serão salvos são decodificados por completo: os demais
+    são apenas avançados com `grab()` ou, quando o intervalo entre frames é
+    grande, pulados com uma busca direta (`CAP_PROP_POS_FRAMES`).
+
     Args:
         caminho_video (str): O caminho para o arquivo de vídeo.
         pasta_saida (str): O diretório onde os frames serão salvos.
         fps_extracao (float): A quantidade de frames a serem extraídos por segundo.
+        modo (str): "grab", "busca" ou "auto" (busca se o intervalo passar
+            de LIMIAR_BUSCA_FRAMES e o total de frames for conhecido).
 
     Returns:
         int: O número de frames extraídos com sucesso.
@@ -60,132 +118,226 @@ def extrair_frames(caminho_video: str, pasta_saida: str, fps_extracao: float) ->
         print("ERRO: Não foi possível ler o FPS do vídeo. Usando valor padrão de 30.")
         fps_video_original = 30 # Valor de fallback
 
-    # Calcula o intervalo entre os frames a serem salvos
-    intervalo_frames = int(fps_video_original / fps_extracao)
-    if intervalo_frames < 1:
-        intervalo_frames = 1
+    # Nunca mais de um frame salvo por frame do vídeo
+    fps_extracao = min(fps_extracao, fps_video_original)
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    intervalo_frames = fps_video_original / fps_extracao
+    if modo == "auto":
+        modo = "busca" if intervalo_frames >= LIMIAR_BUSCA_FRAMES and total_frames > 0 else "grab"
 
-    contador_frames_total = 0
     contador_frames_salvos = 0
+    gravador = GravadorFrames(pasta_saida)
+
+    def salvar(frame):
+        nonlocal contador_frames_salvos
+        gravador.salvar(contador_frames_salvos, frame)
+        contador_frames_salvos += 1
+
+    if modo == "busca":
+        for indice in _indices_alvo(fps_video_original, fps_extracao, total_frames):
+            video.set(cv2.CAP_PROP_POS_FRAMES, indice)
+            sucesso, frame = video.read()
+            if not sucesso:
+                break
+            salvar(frame)
+    else:
+        alvos = _indices_alvo(fps_video_original, fps_extracao)
+        proximo = next(alvos)
+        contador_frames_total = 0
+        while True:
+            # grab() só avança o demuxer/decoder; retrieve() converte o frame
+            # e é chamado apenas para os frames que serão salvos.
+            if not video.grab():
+                break  # Fim do vídeo
+
+            if contador_frames_total == proximo:
+                sucesso, frame = video.retrieve()
+                if not sucesso:
+                    break
+                salvar(frame)
+                proximo = next(alvos)
+
+            contador_frames_total += 1
 
-    while True:
-        sucesso, frame = video.read()
-        if not sucesso:
-            break  # Fim do vídeo
+    video.release()
+    gravador.fechar()
+    print(f"INFO: Extração de frames concluída. {contador_frames_salvos} frames salvos.")
+    return contador_frames_salvos
+
+def _extrair_segmento(caminho_video: str, pasta_saida: str, indices: list, primeiro_numero: int) -> int:
+    """
+    Decodifica um trecho do vídeo em um processo separado: busca o primeiro
+    índice do trecho e avança com `grab()` até os demais. Os frames recebem
+    a numeração global (`primeiro_numero` em diante).
+    """
+    video = cv2.VideoCapture(caminho_video)
+    gravador = GravadorFrames(pasta_saida)
+    salvos = 0
+    try:
+        video.set(cv2.CAP_PROP_POS_FRAMES, indices[0])
+        atual = indices[0]
+        for numero, indice in enumerate(indices, start=primeiro_numero):
+            while atual < indice:
+                if not video.grab():
+                    return salvos
+                atual += 1
+            sucesso, frame = video.read()
+            atual += 1
+            if not sucesso:
+                return salvos
+            gravador.salvar(numero, frame)
+            salvos += 1
+        return salvos
+    finally:
+        video.release()
+        gravador.fechar()
 
-        if contador_frames_total % intervalo_frames == 0:
-            nome_arquivo_frame = os.path.join(pasta_saida, f"frame_{contador_frames_salvos:04d}.jpg")
-            cv2.imwrite(nome_arquivo_frame, frame)
-            contador_frames_salvos += 1
+def extrair_frames_paralelo(caminho_video: str, pasta_saida: str, fps_extracao: float, processos: int | None = None) -> int:
+    """
+    Igual a `extrair_frames`, mas divide o vídeo em trechos de tempo
+    decodificados em processos separados. A numeração `frame_XXXX` é a mesma
+    da versão sequencial.
 
-        contador_frames_total += 1
+    Returns:
+        int: O número de frames extraídos com sucesso.
+    """
+    if not os.path.exists(caminho_video):
+        print(f"ERRO: Arquivo de vídeo não encontrado em '{caminho_video}'")
+        raise FileNotFoundError(f"Arquivo de vídeo não encontrado: {caminho_video}")
 
+    video = cv2.VideoCapture(caminho_video)
+    fps_video_original = video.get(cv2.CAP_PROP_FPS) or 30
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     video.release()
+
+    processos = processos or os.cpu_count() or 1
+    if total_frames <= 0 or processos <= 1:
+        # Sem o total de frames não há como dividir o vídeo em trechos.
+        return extrair_frames(caminho_video, pasta_saida, fps_extracao)
+
+    fps_extracao = min(fps_extracao, fps_video_original)
+    indices = list(_indices_alvo(fps_video_original, fps_extracao, total_frames))
+    tamanho = -(-len(indices) // processos)
+    trechos = [(inicio, indices[inicio:inicio + tamanho]) for inicio in range(0, len(indices), tamanho)]
+    print(f"INFO: Extraindo {len(indices)} frames a {fps_extracao} FPS em {len(trechos)} processos...")
+
+    with ProcessPoolExecutor(max_workers=len(trechos)) as executor:
+        futuros = [
+            executor.submit(_extrair_segmento, caminho_video, pasta_saida, trecho, inicio)
+            for inicio, trecho in trechos
+        ]
+        salvos = [futuro.result() for futuro in futuros]
+
+    contador_frames_salvos = sum(salvos)
+    # O total de frames informado pelo contêiner pode ser maior que o real;
+    # só o último trecho deveria terminar antes do esperado.
+    if any(quantidade < len(trecho) for quantidade, (_, trecho) in zip(salvos[:-1], trechos[:-1])):
+        print("AVISO: Um trecho intermediário terminou antes do esperado; a numeração dos frames pode ter lacunas.")
     print(f"INFO: Extração de frames concluída. {contador_frames_salvos} frames salvos.")
     return contador_frames_salvos
 
-def transcrever_audio(caminho_video: str, pasta_saida: str):
+def transcrever_audio(caminho_video: str, pasta_saida: str, transcritor=None, paralelo: int = 4, executor=None):
     """
-    Extrai o áudio, envia para a API Gemini para transcrição e salva como SRT.
-
-    Esta função implementa um mecanismo robusto que aguarda o processamento do
-    arquivo pela API antes de solicitar a transcrição.
+    Extrai o áudio com o ffmpeg, transcreve-o em trechos paralelos (API
+    Gemini por padrão) e salva as legendas unidas como SRT.
 
     Args:
         caminho_video (str): O caminho para o arquivo de vídeo.
         pasta_saida (str): O diretório onde o arquivo de legenda .srt será salvo.
+        transcritor: Objeto com `transcrever(caminho_audio, duracao)`; veja
+            `transcricao.TranscritorLocal` para testes sem rede.
+        paralelo (int): Número de trechos transcritos ao mesmo tempo.
+        executor: Pool de trechos compartilhado entre vídeos; quando dado,
+            `paralelo` é ignorado e o limite é o do pool.
     """
     print("INFO: Iniciando extração e transcrição de áudio...")
-    caminho_audio_temp = os.path.join(pasta_saida, "audio_temp.mp3")
     caminho_srt = os.path.join(pasta_saida, "legendas.srt")
 
     try:
-        # 1. Extração de áudio com MoviePy
-        with VideoFileClip(caminho_video) as video:
-            if video.audio is None:
-                print("AVISO: O vídeo não possui uma faixa de áudio. Pulando a transcrição.")
-                return
-
-            print("INFO: Extraindo faixa de áudio...")
-            video.audio.write_audiofile(caminho_audio_temp, logger=None)
-
-        # 2. Configuração e chamada da API Gemini
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            print("ERRO: A variável de ambiente GOOGLE_API_KEY não está definida.")
-            return
-
-        genai.configure(api_key=api_key)
-
-        print("INFO: Fazendo upload do arquivo de áudio para a API Gemini...")
-        audio_file = genai.upload_file(path=caminho_audio_temp)
-
-        # 3. Espera ativa pelo processamento do arquivo
-        print(f"INFO: Arquivo '{audio_file.name}' em processamento. Aguardando ficar ativo...")
-        timeout_segundos = 300  # 5 minutos de timeout
-        inicio_espera = time.time()
-
-        while audio_file.state.name == "PROCESSING":
-            if time.time() - inicio_espera > timeout_segundos:
-                print(f"ERRO: Timeout de {timeout_segundos}s atingido. O processamento do arquivo falhou.")
-                return
-
-            time.sleep(5)  # Aguarda 5 segundos antes de verificar novamente
-            audio_file = genai.get_file(name=audio_file.name)
-
-        if audio_file.state.name == "FAILED":
-            print("ERRO: A API falhou ao processar o arquivo de áudio.")
-            return
-
-        print(f"INFO: Arquivo pronto para transcrição (Estado: {audio_file.state.name}).")
-
-        # 4. Geração do conteúdo (transcrição)
-        model = genai.GenerativeModel(model_name="gemini-1.5-pro-latest")
-        prompt = (
-            "Transcreva o áudio a seguir na íntegra. "
-            "A saída deve ser estritamente no formato de legendas SubRip (.srt). "
-            "Use timestamps precisos com milissegundos. Não adicione comentários ou texto extra.\n"
-            "Exemplo do formato esperado:\n"
-            "1\n"
-            "00:00:01,234 --> 00:00:04,567\n"
-            "Este é o primeiro segmento da legenda.\n\n"
-            "2\n"
-            "00:00:05,111 --> 00:00:08,999\n"
-            "E aqui continua o segundo segmento.\n"
-        )
-
-        print("INFO: Enviando prompt para o modelo Gemini...")
-        response = model.generate_content([prompt, audio_file])
-
-        # 5. Salvando a transcrição no arquivo SRT
-        with open(caminho_srt, "w", encoding="utf-8") as f:
-            f.write(response.text)
-
-        print(f"INFO: Transcrição salva com sucesso em '{caminho_srt}'.")
+        transcritor = transcritor or transcricao.TranscritorGemini()
+        if executor is not None:
+            transcricao.transcrever_video(caminho_video, caminho_srt, transcritor, executor)
+        else:
+            with ThreadPoolExecutor(max_workers=paralelo) as executor:
+                transcricao.transcrever_video(caminho_video, caminho_srt, transcritor, executor)
 
-    except FileNotFoundError:
-        # Esse erro já é tratado em extrair_frames, mas é bom ter aqui por segurança.
-        print(f"ERRO: Arquivo de vídeo não encontrado em '{caminho_video}'")
     except Exception as e:
-        # Captura outras exceções (API, MoviePy, etc.)
+        # Captura outras exceções (API, ffmpeg, etc.)
         print(f"ERRO: Ocorreu uma falha inesperada durante a transcrição: {e}")
         # Tenta remover o arquivo de legenda incompleto, se existir
         if os.path.exists(caminho_srt):
             os.remove(caminho_srt)
-    finally:
-        # 6. Limpeza do arquivo de áudio temporário
-        if os.path.exists(caminho_audio_temp):
-            os.remove(caminho_audio_temp)
-            print("INFO: Arquivo de áudio temporário removido.")
 
 
-def criar_tirinha(pasta_frames: str, pasta_saida: str):
+def _rotulo_tempo(nome_arquivo: str, fps_extracao: float) -> str:
+    """Instante (mm:ss, com décimos se preciso) de um `frame_XXXX.jpg` extraído a `fps_extracao` FPS."""
+    segundos = int(nome_arquivo[len("frame_"):-len(".jpg")]) / fps_extracao
+    minutos, resto = divmod(segundos, 60)
+    if resto == int(resto):
+        return f"{int(minutos):02d}:{int(resto):02d}"
+    return f"{int(minutos):02d}:{resto:04.1f}"
+
+def _criar_grades(arquivos_frame: list, pasta_frames: str, pasta_saida: str, colunas: int,
+                  largura_miniatura: int, frames_por_folha: int | None, rotulos: bool, fps_extracao: float) -> list:
     """
-    Combina todos os frames de uma pasta em uma única imagem horizontal.
+    Monta folhas de contato com miniaturas dos frames, linha por linha. Só
+    um frame fica aberto por vez e cada folha tem no máximo
+    `frames_por_folha` miniaturas, então a memória não depende da duração
+    do vídeo.
+    """
+    with Image.open(os.path.join(pasta_frames, arquivos_frame[0])) as img:
+        altura_miniatura = max(1, round(img.height * largura_miniatura / img.width))
+    por_folha = frames_por_folha or len(arquivos_frame)
+    varias_folhas = por_folha < len(arquivos_frame)
+
+    caminhos = []
+    for numero_folha, inicio in enumerate(range(0, len(arquivos_frame), por_folha)):
+        lote = arquivos_frame[inicio:inicio + por_folha]
+        num_linhas = -(-len(lote) // colunas)
+        folha = Image.new('RGB', (min(colunas, len(lote)) * largura_miniatura, num_linhas * altura_miniatura))
+        desenho = ImageDraw.Draw(folha) if rotulos else None
+
+        for linha in range(num_linhas):
+            for coluna, nome in enumerate(lote[linha * colunas:(linha + 1) * colunas]):
+                with Image.open(os.path.join(pasta_frames, nome)) as img:
+                    # Com JPEG, `draft` decodifica já reduzido (escala DCT).
+                    img.draft('RGB', (largura_miniatura, altura_miniatura))
+                    miniatura = img.convert('RGB').resize((largura_miniatura, altura_miniatura))
+                x, y = coluna * largura_miniatura, linha * altura_miniatura
+                folha.paste(miniatura, (x, y))
+                if desenho:
+                    texto = _rotulo_tempo(nome, fps_extracao)
+                    caixa = desenho.textbbox((x + 4, y + 4), texto)
+                    desenho.rectangle((caixa[0] - 2, caixa[1] - 2, caixa[2] + 2, caixa[3] + 2), fill=(0, 0, 0))
+                    desenho.text((x + 4, y + 4), texto, fill=(255, 255, 255))
+
+        nome_folha = f"tirinha_grade_{numero_folha:03d}.png" if varias_folhas else "tirinha_grade.png"
+        caminho_folha = os.path.join(pasta_saida, nome_folha)
+        folha.save(caminho_folha)
+        folha.close()
+        caminhos.append(caminho_folha)
+    return caminhos
+
+def criar_tirinha(pasta_frames: str, pasta_saida: str, modo: str = "tira", colunas: int = 6,
+                  largura_miniatura: int = 320, frames_por_folha: int | None = None, rotulos: bool = False,
+                  fps_extracao: float = FRAMES_POR_SEGUNDO) -> list:
+    """
+    Combina os frames de uma pasta em imagens.
 
     Args:
         pasta_frames (str): O diretório contendo os frames extraídos.
-        pasta_saida (str): O diretório onde a imagem final será salva.
+        pasta_saida (str): O diretório onde as imagens finais serão salvas.
+        modo (str): "tira" junta todos os frames, em tamanho original, em uma
+            única imagem horizontal. "grade" gera folhas de contato com
+            miniaturas de `largura_miniatura` pixels em `colunas` colunas.
+        frames_por_folha (int | None): Modo "grade": divide os frames em
+            várias folhas com no máximo essa quantidade cada (útil para
+            modelos que limitam o número de imagens).
+        rotulos (bool): Modo "grade": escreve o instante de cada frame.
+        fps_extracao (float): Taxa usada na extração, para calcular os instantes.
+
+    Returns:
+        list: Os caminhos das imagens salvas.
     """
     print("INFO: Iniciando criação da tirinha de imagens...")
     caminho_tirinha = os.path.join(pasta_saida, "tirinha_completa.png")
@@ -198,7 +350,13 @@ def criar_tirinha(pasta_frames: str, pasta_saida: str):
 
         if not arquivos_frame:
             print("AVISO: Nenhum frame encontrado para criar a tirinha. Pulando esta etapa.")
-            return
+            return []
+
+        if modo == "grade":
+            caminhos = _criar_grades(arquivos_frame, pasta_frames, pasta_saida, colunas,
+                                     largura_miniatura, frames_por_folha, rotulos, fps_extracao)
+            print(f"INFO: {len(caminhos)} folha(s) de contato salva(s) em '{pasta_saida}'.")
+            return caminhos
 
         # Abre as imagens e as armazena em uma lista
         imagens = [Image.open(os.path.join(pasta_frames, f)) for f in arquivos_frame]
@@ -220,14 +378,135 @@ def criar_tirinha(pasta_frames: str, pasta_saida: str):
         # Salva a imagem final
         tirinha.save(caminho_tirinha)
         print(f"INFO: Tirinha salva com sucesso em '{caminho_tirinha}'.")
+        return [caminho_tirinha]
 
     except FileNotFoundError:
         print(f"ERRO: Pasta de frames '{pasta_frames}' não encontrada.")
     except Exception as e:
         print(f"ERRO: Falha ao criar a tirinha de imagens: {e}")
+    return []
 
 # --- Orquestrador Principal ---
 
+EXTENSOES_VIDEO = (".mp4", ".mkv", ".mov", ".avi", ".webm")
+
+def executar_grafo(etapas: dict, executor) -> dict:
+    """
+    Executa um grafo de tarefas no `executor`.
+
+    `etapas` mapeia o nome de cada etapa para `(funcao, dependencias)`; a
+    função recebe os resultados das dependências, na ordem dada. Uma etapa
+    só é enviada ao executor quando todas as dependências terminaram, então
+    nenhuma thread fica bloqueada esperando outra (o que poderia travar um
+    pool compartilhado). Se uma dependência falha, a etapa falha com o mesmo
+    erro sem ser executada.
+
+    Returns:
+        dict: O `Future` de cada etapa.
+    """
+    futuros = {nome: Future() for nome in etapas}
+
+    def enviar(nome):
+        funcao, dependencias = etapas[nome]
+        for dependencia in dependencias:
+            erro = futuros[dependencia].exception()
+            if erro is not None:
+                futuros[nome].set_exception(erro)
+                return
+        argumentos = [futuros[dependencia].result() for dependencia in dependencias]
+        try:
+            interno = executor.submit(funcao, *argumentos)
+        except Exception as erro:
+            futuros[nome].set_exception(erro)
+            return
+        interno.add_done_callback(lambda f: _copiar_resultado(f, futuros[nome]))
+
+    for nome, (_, dependencias) in etapas.items():
+        if not dependencias:
+            enviar(nome)
+            continue
+        pendentes = [len(dependencias)]
+        trava = threading.Lock()
+
+        def ao_terminar(_, nome=nome, pendentes=pendentes, trava=trava):
+            with trava:
+                pendentes[0] -= 1
+                pronto = pendentes[0] == 0
+            if pronto:
+                enviar(nome)
+
+        for dependencia in dependencias:
+            futuros[dependencia].add_done_callback(ao_terminar)
+    return futuros
+
+def _copiar_resultado(origem: Future, destino: Future):
+    erro = origem.exception()
+    if erro is not None:
+        destino.set_exception(erro)
+    else:
+        destino.set_result(origem.result())
+
+def _cronometrar(nome_video: str, etapa: str, funcao):
+    """Envolve `funcao` para registrar quanto tempo a etapa levou."""
+    def executar(*argumentos):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*argumentos)
+        finally:
+            print(f"INFO: [{nome_video}] Etapa '{etapa}' terminou em {time.perf_counter() - inicio:.1f}s.")
+    return executar
+
+def processar_video(caminho_video: str, args, executor, executor_audio=None) -> tuple:
+    """
+    Monta e inicia o grafo de etapas de um vídeo: extração de frames e
+    transcrição correm ao mesmo tempo, e a tirinha começa assim que os
+    frames existem. Os trechos de áudio vão para `executor_audio`, que os
+    vídeos dividem entre si.
+
+    Returns:
+        tuple: A pasta de saída e os `Future` de cada etapa.
+    """
+    nome_base_video = os.path.splitext(os.path.basename(caminho_video))[0]
+    pasta_saida = os.path.join(os.path.dirname(caminho_video) or '.', nome_base_video)
+    os.makedirs(pasta_saida, exist_ok=True)
+    print(f"INFO: Diretório de saída criado/encontrado em: '{pasta_saida}'")
+
+    def frames():
+        if args.processos == 1:
+            return extrair_frames(caminho_video, pasta_saida, FRAMES_POR_SEGUNDO)
+        return extrair_frames_paralelo(caminho_video, pasta_saida, FRAMES_POR_SEGUNDO, args.processos or None)
+
+    def audio():
+        transcritor = transcricao.TranscritorLocal() if args.transcricao_local else None
+        transcrever_audio(caminho_video, pasta_saida, transcritor, args.paralelo_audio, executor_audio)
+
+    def tirinha(num_frames):
+        if num_frames <= 0:
+            print("AVISO: Nenhuma imagem de frame foi gerada, pulando a criação da tirinha.")
+            return []
+        return criar_tirinha(
+            pasta_saida, pasta_saida, "grade" if args.grade else "tira", args.colunas,
+            args.largura_miniatura, args.frames_por_folha, args.rotulos, FRAMES_POR_SEGUNDO,
+        )
+
+    etapas = {
+        "frames": (frames, []),
+        "audio": (audio, []),
+        "tirinha": (tirinha, ["frames"]),
+    }
+    etapas = {nome: (_cronometrar(nome_base_video, nome, funcao), dependencias)
+              for nome, (funcao, dependencias) in etapas.items()}
+    return pasta_saida, executar_grafo(etapas, executor)
+
+def listar_videos(caminho: str) -> list:
+    """O próprio arquivo, ou os vídeos de uma pasta (em ordem alfabética)."""
+    if os.path.isdir(caminho):
+        return sorted(
+            os.path.join(caminho, nome) for nome in os.listdir(caminho)
+            if nome.lower().endswith(EXTENSOES_VIDEO) and os.path.isfile(os.path.join(caminho, nome))
+        )
+    return [caminho] if os.path.isfile(caminho) else []
+
 def main():
     """
     Função principal que orquestra todo o processo.
@@ -238,52 +517,75 @@ def main():
     )
     parser.add_argument(
         "caminho_video",
-        help="O caminho completo para o arquivo de vídeo a ser processado."
+        help="O caminho do vídeo a ser processado, ou de uma pasta com vários vídeos."
     )
+    parser.add_argument(
+        "--max-tarefas", type=int, default=4,
+        help="Etapas executadas ao mesmo tempo, somando todos os vídeos. Padrão: 4."
+    )
+    parser.add_argument(
+        "--processos", type=int, default=1,
+        help="Processos usados na extração de frames (0 = um por núcleo). Padrão: 1."
+    )
+    parser.add_argument(
+        "--grade", action="store_true",
+        help="Gera folhas de contato com miniaturas em vez de uma tirinha horizontal."
+    )
+    parser.add_argument("--colunas", type=int, default=6, help="Colunas da grade. Padrão: 6.")
+    parser.add_argument("--largura-miniatura", type=int, default=320, help="Largura das miniaturas da grade. Padrão: 320.")
+    parser.add_argument(
+        "--frames-por-folha", type=int, default=None,
+        help="Divide a grade em folhas com no máximo esse número de frames."
+    )
+    parser.add_argument(
+        "--paralelo-audio", type=int, default=4,
+        help="Trechos de áudio transcritos ao mesmo tempo, somando todos os vídeos. Padrão: 4."
+    )
+    parser.add_argument("--transcricao-local", action="store_true", help="Usa o transcritor local (sem rede).")
+    parser.add_argument("--rotulos", action="store_true", help="Escreve o instante de cada frame na grade.")
     args = parser.parse_args()
-    caminho_video = args.caminho_video
 
-    # 1. Validação inicial e criação do diretório de saída
-    if not os.path.isfile(caminho_video):
-        print(f"ERRO CRÍTICO: O arquivo especificado não existe ou não é um arquivo válido: '{caminho_video}'")
+    # 1. Validação inicial
+    videos = listar_videos(args.caminho_video)
+    if not videos:
+        print(f"ERRO CRÍTICO: Nenhum vídeo encontrado em: '{args.caminho_video}'")
         sys.exit(1) # Encerra o script com código de erro
 
-    nome_base_video = os.path.splitext(os.path.basename(caminho_video))[0]
-    pasta_saida = os.path.join(os.path.dirname(caminho_video) or '.', nome_base_video)
-
-    try:
-        os.makedirs(pasta_saida, exist_ok=True)
-        print(f"INFO: Diretório de saída criado/encontrado em: '{pasta_saida}'")
-    except OSError as e:
-        print(f"ERRO CRÍTICO: Não foi possível criar o diretório de saída '{pasta_saida}': {e}")
-        sys.exit(1)
-
-
-    # 2. Execução das tarefas
-    try:
-        # Extração de Frames
-        num_frames = extrair_frames(caminho_video, pasta_saida, FRAMES_POR_SEGUNDO)
-
-        # Transcrição de Áudio
-        transcrever_audio(caminho_video, pasta_saida)
-
-        # Criação da Tirinha
-        if num_frames > 0:
-            criar_tirinha(pasta_saida, pasta_saida)
-        else:
-            print("AVISO: Nenhuma imagem de frame foi gerada, pulando a criação da tirinha.")
-
-        print("\n========================================================")
-        print("✅ Processo concluído com sucesso!")
-        print(f"👉 Todos os arquivos foram salvos em: {os.path.abspath(pasta_saida)}")
-        print("========================================================")
-
-    except Exception as e:
-        print("\n========================================================")
-        print(f"❌ Ocorreu um erro fatal durante a execução: {e}")
-        print("========================================================")
+    # 2. Execução das tarefas: todas as etapas de todos os vídeos dividem o
+    # mesmo pool, limitado por --max-tarefas, e os trechos de áudio de todos
+    # eles um segundo pool, limitado por --paralelo-audio (como em transcricao.py).
+    falhas = 0
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.paralelo_audio)) as executor_audio, \
+            ThreadPoolExecutor(max_workers=max(1, args.max_tarefas)) as executor:
+        grafos = []
+        for caminho_video in videos:
+            try:
+                grafos.append((caminho_video, *processar_video(caminho_video, args, executor, executor_audio)))
+            except OSError as e:
+                print(f"ERRO CRÍTICO: Não foi possível criar o diretório de saída de '{caminho_video}': {e}")
+                falhas += 1
+
+        for caminho_video, pasta_saida, futuros in grafos:
+            erros = {}
+            for nome, futuro in futuros.items():
+                erro = futuro.exception()
+                if erro is not None:
+                    erros[nome] = erro
+            print("\n========================================================")
+            if erros:
+                falhas += 1
+                for nome, erro in erros.items():
+                    print(f"❌ [{caminho_video}] Erro na etapa '{nome}': {erro}")
+            else:
+                print(f"✅ [{caminho_video}] Processo concluído com sucesso!")
+                print(f"👉 Todos os arquivos foram salvos em: {os.path.abspath(pasta_saida)}")
+            print("========================================================")
+
+    print(f"INFO: {len(videos)} vídeo(s) processado(s) em {time.perf_counter() - inicio:.1f}s.")
+    if falhas:
         sys.exit(1)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
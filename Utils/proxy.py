@@ -0,0 +1,100 @@
+"""
+Versões reduzidas ("proxies") dos vídeos para envio aos modelos.
+
+Os modelos amostram os vídeos a ~1 FPS e em resolução reduzida, então
+mandar o 720p original só aumenta o upload, a espera em PROCESSING e o
+corpo base64 da DashScope. `make_proxy` transcodifica o vídeo com o ffmpeg
+(multi-thread) para o FPS, a altura e a taxa de bits de um perfil e guarda
+o resultado em cache, indexado pelo hash do vídeo e pelas configurações.
+
+    path = proxy.make_proxy("downloads/videos/27.mp4", "gemini")
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import threading
+
+import utils
+
+PROXY_DIR = ".cache/proxies"
+PROXY_VERSION = 1
+
+# Perfis por modelo. `audio_bitrate` None remove o áudio (o Qwen-VL não o usa).
+PROFILES = {
+    "gemini": {"fps": 2, "height": 480, "video_bitrate": "600k", "audio_bitrate": "48k"},
+    "qwen": {"fps": 2, "height": 448, "video_bitrate": "500k", "audio_bitrate": None},
+}
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _settings(profile) -> dict:
+    if isinstance(profile, str):
+        if profile not in PROFILES:
+            raise ValueError(f"Perfil de proxy desconhecido: '{profile}'. Opções: {', '.join(sorted(PROFILES))}.")
+        return PROFILES[profile]
+    return profile
+
+
+def proxy_path(video_path: str, settings: dict, proxy_dir: str = PROXY_DIR) -> str:
+    key = json.dumps({"version": PROXY_VERSION, **settings}, sort_keys=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(proxy_dir, f"{utils.hash_file(video_path)}_{digest}.mp4")
+
+
+def transcode(video_path: str, output_path: str, settings: dict, threads: int = 0):
+    """Transcodifica com libx264 sem aumentar a resolução de vídeos menores que o alvo."""
+    height = settings["height"]
+    command = [
+        "ffmpeg", "-y", "-v", "error", "-i", video_path,
+        "-vf", f"fps={settings['fps']},scale=-2:'min({height},ih)'",
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", settings["video_bitrate"], "-maxrate", settings["video_bitrate"], "-bufsize", settings["video_bitrate"],
+        "-threads", str(threads), "-movflags", "+faststart",
+    ]
+    if settings.get("audio_bitrate"):
+        command += ["-c:a", "aac", "-ac", "1", "-b:a", settings["audio_bitrate"]]
+    else:
+        command += ["-an"]
+    subprocess.run(command + [output_path], capture_output=True, text=True, check=True)
+
+
+def make_proxy(video_path: str, profile="gemini", proxy_dir: str = PROXY_DIR, threads: int = 0) -> str:
+    """
+    Caminho do proxy de `video_path` para o perfil (nome em PROFILES ou dict
+    com fps, height, video_bitrate e audio_bitrate), criando-o se preciso.
+    Sem ffmpeg, ou se a transcodificação falhar, devolve o vídeo original.
+    """
+    settings = _settings(profile)
+    output_path = proxy_path(video_path, settings, proxy_dir)
+    if os.path.exists(output_path):
+        return output_path
+    if shutil.which("ffmpeg") is None:
+        logging.warning("ffmpeg não encontrado no PATH; enviando o vídeo original.")
+        return video_path
+
+    # Um proxy é gerado uma única vez mesmo com várias threads pedindo o mesmo vídeo.
+    with _locks_guard:
+        lock = _locks.setdefault(output_path, threading.Lock())
+    with lock:
+        if os.path.exists(output_path):
+            return output_path
+        os.makedirs(proxy_dir, exist_ok=True)
+        tmp_path = f"{output_path}.{os.getpid()}.{threading.get_ident()}.tmp.mp4"
+        try:
+            transcode(video_path, tmp_path, settings, threads)
+            os.replace(tmp_path, output_path)
+        except subprocess.CalledProcessError as e:
+            logging.error(f"Falha ao gerar o proxy de '{video_path}': {e.stderr.strip()}")
+            return video_path
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    original, reduced = os.path.getsize(video_path), os.path.getsize(output_path)
+    logging.info(f"Proxy de '{video_path}': {original / 1e6:.1f} MB -> {reduced / 1e6:.1f} MB.")
+    return output_path
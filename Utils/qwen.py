@@ -108,6 +108,38 @@ from IPython.display import Markdown, display
 #     output_text = processor.batch_decode(generated_ids, skip_special_tokens=True, clean_up_tokenization_spaces=True)
 #     return output_text[0]
 
+def call_api(
+    video_path,
+    prompt,
+    sys_prompt = "You are a helpful assistant.",
+    model_id = "qwen-vl-max-latest",
+):
+    """Chamada à API da DashScope; os erros (429, timeout, payload grande) são propagados."""
+    load_dotenv()
+    client = OpenAI(
+        api_key = os.getenv('DASHSCOPE_API_KEY'),
+        base_url = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
+    )
+    messages = [
+        {
+            "role": "system",
+            "content": [{"type":"text","text": sys_prompt}]
+        },
+        {
+            "role": "user",
+            "content": [
+                {"type": "video_url", "video_url": {"url": video_path}},
+                {"type": "text", "text": prompt},
+        ]
+    }
+    ]
+    completion = client.chat.completions.create(
+        model = model_id,
+        messages = messages,
+    )
+    # print(completion)
+    return completion.choices[0].message.content
+
 def inference_with_api(
     video_path,
     prompt,
@@ -115,30 +147,7 @@ def inference_with_api(
     model_id = "qwen-vl-max-latest",
 ):
     try:
-        load_dotenv()
-        client = OpenAI(
-            api_key = os.getenv('DASHSCOPE_API_KEY'),
-            base_url = "https://dashscope-intl.aliyuncs.com/compatible-mode/v1",
-        )    
-        messages = [
-            {
-                "role": "system",
-                "content": [{"type":"text","text": sys_prompt}]
-            },
-            {
-                "role": "user",
-                "content": [
-                    {"type": "video_url", "video_url": {"url": video_path}},
-                    {"type": "text", "text": prompt},
-            ]
-        }
-        ]
-        completion = client.chat.completions.create(
-            model = model_id,
-            messages = messages,
-        )
-        # print(completion)
-        return completion.choices[0].message.content
+        return call_api(video_path, prompt, sys_prompt, model_id)
     except Exception as e:
         print(f"An error occurred: {e}")
         return str(e)
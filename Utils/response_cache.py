@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+
+
+class ResponseCache:
+    """
+    Cache persistente das respostas dos modelos.
+
+    Cada resposta é anexada como uma linha JSON e sincronizada com o disco
+    assim que chega, então uma execução interrompida perde no máximo a
+    resposta que estava em andamento. A chave combina modelo, hash do
+    conteúdo do vídeo, hash do prompt e a configuração de geração. Com
+    `path=None` o cache fica só em memória.
+    """
+
+    def __init__(self, path="cache/responses_cache.jsonl"):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        # Tamanho até o fim da última linha terminada em "\n".
+        complete = 0
+        tail = None
+        with open(self.path, "rb") as file:
+            for raw in file:
+                if raw.endswith(b"\n"):
+                    complete += len(raw)
+                else:
+                    tail = raw
+                try:
+                    entry = json.loads(raw)
+                except json.JSONDecodeError:
+                    # Linha parcial de uma execução interrompida.
+                    continue
+                self.entries[entry["key"]] = entry
+                if raw is tail:
+                    tail = None
+        if tail is not None or complete < os.path.getsize(self.path):
+            # Sem isso a próxima resposta seria anexada à linha cortada.
+            with open(self.path, "r+b") as file:
+                if tail is None:
+                    file.seek(0, os.SEEK_END)
+                    file.write(b"\n")
+                else:
+                    file.truncate(complete)
+        print(f"Cache de respostas carregado: {len(self.entries)} entradas em '{self.path}'.")
+
+    @staticmethod
+    def make_key(model: str, video_hash: str, prompt: str, config: dict | None = None) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        payload = json.dumps([model, video_hash, prompt_hash, config or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def get(self, key: str) -> str | None:
+        entry = self.entries.get(key)
+        return entry["response"] if entry else None
+
+    def put(self, key: str, response: str, **metadata):
+        entry = {"key": key, "response": response, **metadata}
+        line = json.dumps(entry, ensure_ascii=False, default=str)
+        with self.lock:
+            self.entries[key] = entry
+            if self.path is None:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
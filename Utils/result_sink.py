@@ -0,0 +1,143 @@
+"""
+Gravação incremental dos resultados de uma avaliação.
+
+Cada resposta vira um registro (question_id, resposta bruta e processada,
+acerto, latência, tokens...) anexado ao arquivo assim que chega, em vez de
+um único `to_excel` no fim da execução. A planilha passa a ser um passo de
+pós-processamento:
+
+    python result_sink.py responses/responses_gemini-1.5-pro.jsonl responses/responses_gemini-1.5-pro.xlsx
+"""
+
+import argparse
+import glob
+import json
+import os
+import threading
+
+import pandas as pd
+
+EXCEL_COLUMNS = ["question_id", "response", "is_correct"]
+
+
+class JsonlResultSink:
+    """Anexa um registro JSON por linha; cada linha vai para o disco ao ser escrita."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self.lock:
+            self.file.write(line + "\n")
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ParquetResultSink:
+    """
+    Grava os registros em partes Parquet dentro de um diretório, uma a cada
+    `batch_size` registros. Cada parte é um arquivo completo, então uma
+    execução interrompida perde no máximo o lote em memória.
+    """
+
+    def __init__(self, path: str, batch_size: int = 64):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = []
+        self.part = len(glob.glob(os.path.join(path, "part-*.parquet")))
+        self.lock = threading.Lock()
+
+    def write(self, record: dict):
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        df = pd.DataFrame(self.buffer)
+        # IDs e respostas podem misturar números e texto; o Parquet exige um tipo só.
+        for column in ("question_id", "response", "raw_response"):
+            if column in df.columns:
+                df[column] = df[column].astype(str)
+        df.to_parquet(os.path.join(self.path, f"part-{self.part:05d}.parquet"), index=False)
+        self.part += 1
+        self.buffer = []
+
+    def close(self):
+        with self.lock:
+            self._flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_sink(path: str):
+    """Escolhe o formato pela extensão: `.jsonl` ou diretório Parquet."""
+    if path.endswith(".jsonl"):
+        return JsonlResultSink(path)
+    return ParquetResultSink(path)
+
+
+def load_results(path: str) -> pd.DataFrame:
+    """Lê os registros gravados, mantendo só o último de cada pergunta."""
+    if path.endswith(".jsonl"):
+        records = []
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Linha parcial de uma execução interrompida.
+                    continue
+        df = pd.DataFrame(records)
+    else:
+        df = pd.read_parquet(path)
+    if df.empty:
+        return df
+    return df.drop_duplicates(subset="question_id", keep="last").reset_index(drop=True)
+
+
+def export_excel(path: str, output_file: str, columns=EXCEL_COLUMNS):
+    """Gera a planilha de respostas no formato de `utils.saveResponses`."""
+    df = load_results(path)
+    if df.empty:
+        print(f"Nenhum resultado encontrado em '{path}'.")
+        return
+    df = df.sort_values("question_id", key=lambda ids: pd.to_numeric(ids, errors="coerce"), kind="stable")
+    df[[column for column in columns if column in df.columns]].to_excel(output_file, index=False, engine="openpyxl")
+    print(f"Dados salvos com sucesso no arquivo '{output_file}'!")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta os resultados gravados (JSONL/Parquet) para Excel.")
+    parser.add_argument("results", help="Arquivo .jsonl ou diretório Parquet com os resultados.")
+    parser.add_argument("output_file", help="Planilha .xlsx de saída.")
+    parser.add_argument("--all-columns", action="store_true", help="Inclui latência, tokens e demais campos.")
+    args = parser.parse_args()
+    columns = list(load_results(args.results).columns) if args.all_columns else EXCEL_COLUMNS
+    export_excel(args.results, args.output_file, columns)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+"""
+Executor único do BeSIM para qualquer backend registrado em backends.py.
+
+Uso:
+    python runner.py --backend gemini --model gemini-2.5-flash
+    python runner.py --backend llava --max-videos 2
+    python runner.py --backend llava --llava-server 127.0.0.1:6001 --max-requests 8
+    python runner.py --backend llava --frame-budgets 8 16 32 64
+    python runner.py --backend replay --cassette cache/cassette.jsonl --model gemini-1.5-pro
+
+Os vídeos são processados em paralelo (limitados por --max-videos), as
+respostas passam pelo cache persistente e só as perguntas que faltam são
+enviadas ao modelo.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import backends
+import cassette
+import result_sink
+import scheduler
+import utils
+from response_cache import ResponseCache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Avalia um modelo no BeSIM usando o backend escolhido.",
+        formatter_class=argparse.RawTextHelpFormatter,
+    )
+    parser.add_argument("--backend", required=True, choices=sorted(backends.BACKENDS), help="Backend do modelo.")
+    parser.add_argument("--model", default=None, help="Nome do modelo (padrão: o do backend).")
+    parser.add_argument("--table", default="BeSimV5.xlsx", help="Planilha com as perguntas e os vídeos.")
+    parser.add_argument("--videos-dir", default="downloads/videos", help="Pasta com os vídeos <id>.mp4.")
+    parser.add_argument("--max-videos", type=int, default=4, help="Vídeos processados ao mesmo tempo.")
+    parser.add_argument("--max-requests", type=int, default=8, help="Chamadas simultâneas ao modelo.")
+    parser.add_argument("--rpm", type=float, default=None, help="Limite de requisições por minuto.")
+    parser.add_argument("--tpm", type=float, default=None, help="Limite de tokens por minuto.")
+    parser.add_argument("--max-retries", type=int, default=200, help="Orçamento total de retentativas da execução.")
+    parser.add_argument("--batch", action="store_true", help="Gemini: uma chamada por vídeo com todas as perguntas.")
+    parser.add_argument("--local", action="store_true", help="Gemini: usa o cliente local (sem rede).")
+    parser.add_argument("--proxy", action="store_true",
+                        help="Gemini/Qwen: envia uma versão reduzida do vídeo (perfis em proxy.py).")
+    parser.add_argument("--llava-server", default=None,
+                        help="LLaVA: endereço (host:porta) de um llava_server.py já em execução.")
+    parser.add_argument("--prefix-cache", action="store_true",
+                        help="LLaVA: reaproveita o prefill dos frames entre as perguntas do mesmo vídeo.")
+    parser.add_argument("--prefetch", type=int, default=0,
+                        help="LLaVA: vídeos decodificados em segundo plano enquanto o modelo gera (0 = desligado).")
+    parser.add_argument("--decoder-threads", type=int, default=None, help="LLaVA: threads do decord por vídeo.")
+    parser.add_argument("--max-frames", type=int, default=None, help="GPT/LLaVA: número máximo de frames.")
+    parser.add_argument("--frame-budgets", type=int, nargs="+", default=None,
+                        help="LLaVA: avalia vários números de frames na mesma execução (ex: 8 16 32 64),\n"
+                             "decodificando só a maior amostra; um arquivo de resultados por budget.")
+    parser.add_argument("--sampling", choices=["uniform", "shots"], default="uniform",
+                        help="GPT/LLaVA: frames igualmente espaçados ou divididos entre as cenas do vídeo.")
+    parser.add_argument("--frame-height", type=int, default=None, help="GPT: altura dos frames enviados (padrão: 768).")
+    parser.add_argument("--jpeg-quality", type=int, default=None, help="GPT: qualidade JPEG dos frames (padrão: 95).")
+    parser.add_argument("--cache-file", default="cache/responses_cache.jsonl", help="Cache persistente de respostas.")
+    parser.add_argument("--results", default=None,
+                        help="Arquivo .jsonl (ou diretório Parquet) de resultados. Padrão: responses/responses_<modelo>.jsonl")
+    parser.add_argument("--no-excel", action="store_true", help="Não exporta a planilha .xlsx ao final.")
+    parser.add_argument("--no-cache", action="store_true", help="Não lê nem grava o cache de respostas.")
+    parser.add_argument("--record", default=None, help="Grava as interações com o modelo neste cassete (JSONL).")
+    parser.add_argument("--cassette", default=None, help="Replay: cassete gravado com --record.")
+    parser.add_argument("--replay-config", type=json.loads, default=None,
+                        help="Replay: config (JSON) do backend gravado, ex: '{\"max_frames\": 8}'. Padrão: {}.")
+    parser.add_argument("--latency-scale", type=float, default=0.0,
+                        help="Replay: fator aplicado à latência gravada (0 = sem espera).")
+    return parser.parse_args()
+
+
+def backend_options(args) -> dict:
+    retry = scheduler.RetryPolicy(
+        limiter=scheduler.AdaptiveLimiter(initial=max(1, args.max_requests // 2), maximum=args.max_requests),
+        budget=scheduler.RetryBudget(args.max_retries),
+        breaker=scheduler.CircuitBreaker(),
+    )
+    options = {"max_requests": args.max_requests, "limiter": scheduler.RateLimiter(args.rpm, args.tpm), "retry": retry}
+    if args.model:
+        options["model"] = args.model
+    if args.backend == "gemini":
+        options.update(batch=args.batch, local=args.local)
+    if args.backend in ("gemini", "qwen"):
+        options["proxy"] = args.proxy
+    if args.backend in ("gpt", "llava"):
+        options["sampling"] = args.sampling
+        if args.max_frames:
+            options["max_frames"] = args.max_frames
+    if args.backend == "llava":
+        if args.llava_server:
+            options["server"] = args.llava_server
+        else:
+            options.update(prefix_cache=args.prefix_cache, prefetch=args.prefetch, decoder_threads=args.decoder_threads)
+    if args.backend == "gpt":
+        options.update(frame_height=args.frame_height, jpeg_quality=args.jpeg_quality)
+    if args.backend == "replay":
+        options.update(cassette=args.cassette, latency_scale=args.latency_scale, config=args.replay_config)
+    return options
+
+
+async def evaluate(backend, questions: dict, videos: dict, cache: ResponseCache, videos_dir: str, max_videos: int, sink=None) -> dict:
+    """
+    Responde todas as perguntas e devolve {question_id: resposta bruta}.
+    Com `sink`, cada resposta também é gravada assim que fica disponível.
+    """
+    answers = {}
+    semaphore = asyncio.Semaphore(max_videos)
+
+    def record(video_id, question_id, raw_response, **extra):
+        answers[question_id] = raw_response
+        if sink is None:
+            return
+        question = questions[video_id][question_id]
+        response = utils.process_response(raw_response)
+        sink.write({
+            "question_id": question_id, "video_id": video_id, "model": backend.model,
+            "raw_response": raw_response, "response": response, "answer": question["answer"],
+            "is_correct": response == question["answer"], **extra,
+        })
+
+    def plan(video_id):
+        """Separa as perguntas já respondidas no cache das que faltam."""
+        path = os.path.join(videos_dir, f"{str(int(video_id))}.mp4")
+        if not os.path.exists(path):
+            print(f"Arquivo de vídeo não encontrado: {path}. Pulando...")
+            return None
+
+        video_hash = utils.hash_file(path)
+        keys = {}
+        todo = {}
+        for question_id, question in questions.get(video_id, {}).items():
+            key = ResponseCache.make_key(backend.model, video_hash, utils.createQuestion(question), backend.config)
+            if key in cache:
+                record(video_id, question_id, cache.get(key), cached=True)
+            else:
+                keys[question_id] = key
+                todo[question_id] = question
+        if not todo:
+            return None
+        return {**videos[video_id], "id": video_id, "path": path, "hash": video_hash}, keys, todo
+
+    async def process(video, keys, todo):
+        video_id = video["id"]
+        async with semaphore:
+            inicio = time.perf_counter()
+            try:
+                result = await backend.answer(video, todo)
+            except Exception as e:
+                logging.error(f"Falha ao processar o vídeo {video_id}: {e}")
+                return
+            elapsed = time.perf_counter() - inicio
+            logging.info(f"Vídeo {video_id}: {len(result)} respostas em {elapsed:.2f}s")
+
+        for question_id, response in result.items():
+            cache.put(keys[question_id], response, model=backend.model, question_id=question_id)
+            latency = backend.latencies.pop(question_id, elapsed)
+            record(video_id, question_id, response, latency=latency, video_latency=elapsed)
+
+    jobs = [job for job in map(plan, videos) if job is not None]
+    # Backends que preparam os vídeos com antecedência recebem a ordem de execução.
+    backend.prefetch([video for video, _, _ in jobs])
+    await asyncio.gather(*(process(*job) for job in jobs))
+    return answers
+
+
+def budget_path(results_path: str, budget: int) -> str:
+    """responses/x.jsonl -> responses/x_8f.jsonl (ou o diretório Parquet com o sufixo)."""
+    root, ext = os.path.splitext(results_path)
+    return f"{root}_{budget}f{ext}"
+
+
+def summarize(answers: dict, questions: dict, videos: dict):
+    corretas = 0
+    total = 0
+    for video_id in videos:
+        for question_id, question in questions.get(video_id, {}).items():
+            if question_id not in answers:
+                continue
+            total += 1
+            response = utils.process_response(answers[question_id])
+            corretas += response == question["answer"]
+
+    print(f"Total de perguntas: {total}")
+    print(f"Total de respostas corretas: {corretas}")
+    if total:
+        print(f"Porcentagem de acertos: {corretas/total*100:.2f}%")
+
+
+def main():
+    args = parse_args()
+    if args.backend == "replay" and not args.cassette:
+        print("ERRO: --backend replay exige --cassette.")
+        sys.exit(1)
+
+    if args.frame_budgets and (args.backend != "llava" or args.llava_server or args.sampling != "uniform" or args.record):
+        print("ERRO: --frame-budgets só funciona com --backend llava local, amostragem uniforme e sem --record.")
+        sys.exit(1)
+
+    backend = backends.get_backend(args.backend, **backend_options(args))
+    if args.record:
+        backend = cassette.RecordingBackend(backend, args.record)
+    questions = utils.load_questions(args.table)
+    videos = utils.load_video_table(args.table)
+    # O replay não usa o cache: as respostas já vêm do cassete.
+    cache = ResponseCache(None if args.no_cache or args.backend == "replay" else args.cache_file)
+
+    model_name = os.path.basename(backend.model)
+    results_path = args.results or f"responses/responses_{model_name}.jsonl"
+    excel_path = f"responses/responses_{model_name}.xlsx"
+    if args.frame_budgets:
+        # Um "backend" por budget, todos sobre o mesmo modelo carregado.
+        budgets = sorted(set(args.frame_budgets))
+        runs = [(backends.FrameBudget(backend, budget, budgets), budget_path(results_path, budget), budget_path(excel_path, budget))
+                for budget in budgets]
+    else:
+        runs = [(backend, results_path, excel_path)]
+    sinks = [result_sink.open_sink(path) for _, path, _ in runs]
+
+    async def evaluate_all():
+        return await asyncio.gather(*(
+            evaluate(run_backend, questions, videos, cache, args.videos_dir, args.max_videos, sink)
+            for (run_backend, _, _), sink in zip(runs, sinks)
+        ))
+
+    inicio = time.perf_counter()
+    try:
+        all_answers = asyncio.run(evaluate_all())
+    finally:
+        backend.close()
+        for sink in sinks:
+            sink.close()
+
+    for (run_backend, path, excel), answers in zip(runs, all_answers):
+        if len(runs) > 1:
+            print(f"--- {run_backend.budget} frames ({path}) ---")
+        if not args.no_excel:
+            result_sink.export_excel(path, excel)
+        summarize(answers, questions, videos)
+    print(f"Tempo total: {time.perf_counter() - inicio:.2f}s")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\nExecução interrompida pelo usuário.")
+        sys.exit(0)
@@ -0,0 +1,282 @@
+import email.utils
+import logging
+import random
+import re
+import threading
+import time
+
+# Estimativa de tokens consumidos por segundo de vídeo na API do Gemini
+# (~258 tokens de imagem + ~32 de áudio por segundo, arredondado para cima).
+TOKENS_POR_SEGUNDO_VIDEO = 300
+# Duração usada quando a tabela não informa início/fim (limite do BeSIM).
+DURACAO_PADRAO_VIDEO = 600
+
+
+class TokenBucket:
+    """
+    Balde de tokens thread-safe com reposição contínua.
+
+    A taxa é dada por minuto; `acquire` bloqueia até haver saldo suficiente.
+    Pedidos maiores que a capacidade são limitados a ela para não travarem
+    para sempre. O saldo pode ficar negativo depois de `adjust`, o que faz as
+    próximas chamadas esperarem a "dívida" ser paga.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: float | None = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0):
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def adjust(self, delta: float):
+        """Debita (delta > 0) ou devolve (delta < 0) tokens já consumidos."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class RateLimiter:
+    """
+    Limitador do lado do cliente para requisições por minuto (RPM) e tokens
+    por minuto (TPM). Qualquer um dos limites pode ser None (sem limite).
+    """
+
+    def __init__(self, requests_per_minute: float | None = None, tokens_per_minute: float | None = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def acquire(self, estimated_tokens: int = 0):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens and estimated_tokens:
+            self.tokens.acquire(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, real_tokens: int | None):
+        """Corrige o balde de TPM com o consumo real informado pela API."""
+        if self.tokens and real_tokens is not None:
+            self.tokens.adjust(real_tokens - estimated_tokens)
+
+
+def estimate_tokens(prompt: str, video_seconds: float | None = None) -> int:
+    """Estimativa grosseira de tokens de uma requisição (vídeo + texto)."""
+    if video_seconds is None:
+        video_seconds = DURACAO_PADRAO_VIDEO
+    return int(video_seconds * TOKENS_POR_SEGUNDO_VIDEO + len(prompt) / 4)
+
+
+# --- Retentativas e controle adaptativo de concorrência ---
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+
+class RetryBudgetExhausted(Exception):
+    """O orçamento de retentativas da execução acabou."""
+
+
+def error_status(error) -> int | None:
+    """Código HTTP de um erro do SDK do Gemini ou da OpenAI, se houver."""
+    for attribute in ("code", "status_code"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def retry_after(error) -> float | None:
+    """Tempo de espera sugerido pela API (cabeçalho Retry-After ou RetryInfo)."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                moment = email.utils.parsedate_to_datetime(value)
+                return max(0.0, moment.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    # Erros 429 do Gemini trazem o atraso em details: {"retryDelay": "34s"}.
+    text = f"{getattr(error, 'details', '')} {error}"
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"](\d+(?:\.\d+)?)s", text)
+    return float(match.group(1)) if match else None
+
+
+def is_retryable(error) -> bool:
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    # Sem código HTTP: falhas de rede/timeout são transitórias.
+    name = type(error).__name__
+    return isinstance(error, (ConnectionError, TimeoutError)) or any(
+        word in name for word in ("Timeout", "Connection", "Network", "Protocol")
+    )
+
+
+class AdaptiveLimiter:
+    """
+    Limite de chamadas simultâneas ajustado por AIMD: cresce 1/limite a
+    cada sucesso (≈ +1 por "janela") e cai pela metade quando a API indica
+    sobrecarga (429/503), no máximo uma vez por `cooldown` segundos.
+    """
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32, cooldown: float = 5.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self, overloaded: bool = False, success: bool = True):
+        with self.condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self.last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+                    logging.warning(f"Sobrecarga na API: concorrência reduzida para {int(self.limit)}.")
+            elif success:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self.condition.notify_all()
+
+
+class RetryBudget:
+    """Número máximo de retentativas somando todas as chamadas da execução."""
+
+    def __init__(self, max_retries: int = 200):
+        self.remaining = max_retries
+        self.lock = threading.Lock()
+
+    def spend(self) -> bool:
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Abre após `threshold` falhas seguidas: as chamadas esperam `reset_timeout`
+    segundos e então uma única chamada de teste é liberada (meio-aberto). Se
+    ela der certo o circuito fecha; se falhar, abre de novo.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 60.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.condition = threading.Condition()
+
+    def before_call(self):
+        with self.condition:
+            while self.opened_at is not None:
+                wait = self.opened_at + self.reset_timeout - time.monotonic()
+                if wait <= 0 and not self.probing:
+                    self.probing = True
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def record(self, success: bool):
+        with self.condition:
+            if success:
+                self.failures = 0
+                self.opened_at = None
+            else:
+                self.failures += 1
+                if self.probing or self.failures >= self.threshold:
+                    if self.opened_at is None or self.probing:
+                        logging.warning(f"Circuito aberto após {self.failures} falhas seguidas.")
+                    self.opened_at = time.monotonic()
+            self.probing = False
+            self.condition.notify_all()
+
+
+class RetryPolicy:
+    """
+    Executa uma chamada com retentativas: backoff exponencial com jitter,
+    respeito ao Retry-After, separação entre erros transitórios e fatais,
+    orçamento global de retentativas, disjuntor e limite adaptativo.
+    """
+
+    def __init__(self, max_attempts: int = 8, base_delay: float = 1.0, max_delay: float = 60.0,
+                 limiter: AdaptiveLimiter | None = None, budget: RetryBudget | None = None,
+                 breaker: CircuitBreaker | None = None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.limiter = limiter
+        self.budget = budget
+        self.breaker = breaker
+
+    def delay(self, attempt: int, error) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        suggested = retry_after(error)
+        return max(backoff, suggested) if suggested is not None else backoff
+
+    def call(self, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            if self.breaker:
+                self.breaker.before_call()
+            if self.limiter:
+                self.limiter.acquire()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                status = error_status(e)
+                if self.limiter:
+                    self.limiter.release(overloaded=status in OVERLOAD_STATUS, success=False)
+                retryable = is_retryable(e)
+                if self.breaker:
+                    # Erros do cliente (4xx) não indicam falha da API.
+                    self.breaker.record(success=not retryable)
+                attempt += 1
+                if not retryable:
+                    logging.error(f"Erro não recuperável ({status}): {e}")
+                    raise
+                if attempt >= self.max_attempts:
+                    logging.error(f"Desistindo após {attempt} tentativas: {e}")
+                    raise
+                if self.budget and not self.budget.spend():
+                    raise RetryBudgetExhausted(f"Orçamento de retentativas esgotado. Último erro: {e}") from e
+                wait = self.delay(attempt, e)
+                logging.warning(f"Erro ({status}): {e}. Nova tentativa em {wait:.1f}s ({attempt}/{self.max_attempts}).")
+                time.sleep(wait)
+                continue
+
+            if self.limiter:
+                self.limiter.release()
+            if self.breaker:
+                self.breaker.record(success=True)
+            return result
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+
+"""
+Transcrição de áudio em trechos paralelos
+=========================================
+
+O áudio do vídeo é extraído com o ffmpeg em mono e baixa taxa de bits,
+dividido nos silêncios em trechos de ~2 minutos e cada trecho é transcrito
+separadamente, vários ao mesmo tempo. As legendas de cada trecho são
+deslocadas pelo início do trecho e unidas em um único SRT.
+
+Uso:
+    python transcricao.py downloads/videos/27.mp4 downloads/videos/28.mp4 --paralelo 8
+    python transcricao.py downloads/videos/*.mp4 --local
+
+Todos os trechos de todos os vídeos dividem o mesmo pool de threads, então o
+tempo total cresce com a concorrência disponível e não com a soma das
+durações.
+
+Pré-requisitos:
+    - ffmpeg e ffprobe no PATH.
+    - Chave de API do Gemini na variável de ambiente GOOGLE_API_KEY (exceto com --local).
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import scheduler
+
+# --- Configurações ---
+TAXA_AMOSTRAGEM = 16000
+TAXA_BITS = "32k"
+DURACAO_TRECHO = 120.0
+DURACAO_MAXIMA_TRECHO = 180.0
+# Abaixo desse volume (dB) por pelo menos SILENCIO_MINIMO segundos conta como silêncio.
+RUIDO_DB = -35
+SILENCIO_MINIMO = 0.4
+MODELO_TRANSCRICAO = "gemini-1.5-pro-latest"
+PROMPT_TRANSCRICAO = (
+    "Transcreva o áudio a seguir na íntegra. "
+    "A saída deve ser estritamente no formato de legendas SubRip (.srt). "
+    "Use timestamps precisos com milissegundos. Não adicione comentários ou texto extra.\n"
+    "Exemplo do formato esperado:\n"
+    "1\n"
+    "00:00:01,234 --> 00:00:04,567\n"
+    "Este é o primeiro segmento da legenda.\n\n"
+    "2\n"
+    "00:00:05,111 --> 00:00:08,999\n"
+    "E aqui continua o segundo segmento.\n"
+)
+
+
+# --- ffmpeg ---
+
+def _executar(comando: list) -> subprocess.CompletedProcess:
+    if shutil.which(comando[0]) is None:
+        raise RuntimeError(f"'{comando[0]}' não encontrado no PATH. Instale o ffmpeg.")
+    return subprocess.run(comando, capture_output=True, text=True, check=True)
+
+
+def tem_audio(caminho_video: str) -> bool:
+    saida = _executar([
+        "ffprobe", "-v", "error", "-select_streams", "a", "-show_entries", "stream=index",
+        "-of", "csv=p=0", caminho_video,
+    ]).stdout
+    return bool(saida.strip())
+
+
+def duracao_midia(caminho: str) -> float:
+    saida = _executar([
+        "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", caminho,
+    ]).stdout
+    return float(saida.strip())
+
+
+def extrair_audio(caminho_video: str, caminho_audio: str):
+    """Grava o áudio em MP3 mono de baixa taxa de bits (suficiente para fala)."""
+    _executar([
+        "ffmpeg", "-y", "-v", "error", "-i", caminho_video, "-vn",
+        "-ac", "1", "-ar", str(TAXA_AMOSTRAGEM), "-b:a", TAXA_BITS, caminho_audio,
+    ])
+
+
+def detectar_silencios(caminho_audio: str, ruido_db: float = RUIDO_DB, duracao_minima: float = SILENCIO_MINIMO) -> list:
+    """Intervalos (início, fim) de silêncio, pelo filtro silencedetect do ffmpeg."""
+    saida = _executar([
+        "ffmpeg", "-v", "info", "-i", caminho_audio,
+        "-af", f"silencedetect=noise={ruido_db}dB:d={duracao_minima}", "-f", "null", "-",
+    ]).stderr
+    inicios = [float(valor) for valor in re.findall(r"silence_start: (-?[\d.]+)", saida)]
+    fins = [float(valor) for valor in re.findall(r"silence_end: ([\d.]+)", saida)]
+    return list(zip(inicios, fins))
+
+
+def cortar_audio(caminho_audio: str, inicio: float, fim: float, destino: str):
+    _executar([
+        "ffmpeg", "-y", "-v", "error", "-ss", f"{inicio:.3f}", "-to", f"{fim:.3f}",
+        "-i", caminho_audio, "-c", "copy", destino,
+    ])
+
+
+def dividir_em_trechos(silencios: list, duracao: float, duracao_alvo: float = DURACAO_TRECHO,
+                       duracao_maxima: float = DURACAO_MAXIMA_TRECHO) -> list:
+    """
+    Trechos (início, fim) de ~`duracao_alvo` segundos. Cada corte cai no
+    meio do silêncio mais próximo do alvo que não ultrapasse
+    `duracao_maxima`; sem silêncio nessa faixa, o corte é feito no máximo.
+    """
+    meios = sorted((inicio + fim) / 2 for inicio, fim in silencios)
+    trechos = []
+    inicio = 0.0
+    while duracao - inicio > duracao_maxima:
+        candidatos = [meio for meio in meios if inicio + duracao_alvo / 2 <= meio <= inicio + duracao_maxima]
+        corte = min(candidatos, key=lambda meio: abs(meio - inicio - duracao_alvo)) if candidatos else inicio + duracao_maxima
+        trechos.append((inicio, corte))
+        inicio = corte
+    trechos.append((inicio, duracao))
+    return trechos
+
+
+# --- SRT ---
+
+_TEMPO_SRT = r"(\d+):(\d{2}):(\d{2})[,.](\d{3})"
+
+
+def _segundos(horas, minutos, segundos, milis) -> float:
+    return int(horas) * 3600 + int(minutos) * 60 + int(segundos) + int(milis) / 1000
+
+
+def _tempo_srt(segundos: float) -> str:
+    milis = int(round(segundos * 1000))
+    horas, milis = divmod(milis, 3600000)
+    minutos, milis = divmod(milis, 60000)
+    segundos, milis = divmod(milis, 1000)
+    return f"{horas:02d}:{minutos:02d}:{segundos:02d},{milis:03d}"
+
+
+def ler_srt(texto: str) -> list:
+    """Segmentos (início, fim, texto) de um SRT, ignorando cercas de markdown e numeração."""
+    segmentos = []
+    for bloco in re.split(r"\n\s*\n", texto.replace("\r\n", "\n").strip()):
+        linhas = [linha for linha in bloco.strip().split("\n") if not linha.startswith("```")]
+        for posicao, linha in enumerate(linhas):
+            tempos = re.match(rf"\s*{_TEMPO_SRT}\s*-->\s*{_TEMPO_SRT}", linha)
+            if tempos:
+                valores = tempos.groups()
+                conteudo = "\n".join(linhas[posicao + 1:]).strip()
+                if conteudo:
+                    segmentos.append((_segundos(*valores[:4]), _segundos(*valores[4:]), conteudo))
+                break
+    return segmentos
+
+
+def formatar_srt(segmentos: list) -> str:
+    return "\n".join(
+        f"{numero}\n{_tempo_srt(inicio)} --> {_tempo_srt(fim)}\n{conteudo}\n"
+        for numero, (inicio, fim, conteudo) in enumerate(segmentos, start=1)
+    )
+
+
+def juntar_srt(partes: list) -> str:
+    """
+    Une os SRTs de cada trecho. `partes` é uma lista de (início, fim, srt)
+    por trecho; os tempos são deslocados pelo início do trecho e limitados
+    ao seu fim (modelos às vezes passam um pouco da duração do áudio).
+    """
+    segmentos = []
+    for inicio_trecho, fim_trecho, texto in sorted(partes, key=lambda parte: parte[0]):
+        for inicio, fim, conteudo in ler_srt(texto):
+            inicio = min(inicio + inicio_trecho, fim_trecho)
+            fim = min(max(fim + inicio_trecho, inicio), fim_trecho)
+            segmentos.append((inicio, fim, conteudo))
+    return formatar_srt(segmentos)
+
+
+# --- Transcritores ---
+
+class TranscritorGemini:
+    """Envia cada trecho para a API Gemini (SDK google.generativeai)."""
+
+    def __init__(self, modelo: str = MODELO_TRANSCRICAO, retry: scheduler.RetryPolicy | None = None, timeout: float = 300):
+        import google.generativeai as genai
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("A variável de ambiente GOOGLE_API_KEY não está definida.")
+        genai.configure(api_key=api_key)
+        self.genai = genai
+        self.modelo = genai.GenerativeModel(model_name=modelo)
+        self.retry = retry or scheduler.RetryPolicy()
+        self.timeout = timeout
+
+    def transcrever(self, caminho_audio: str, duracao: float) -> str:
+        audio_file = self.genai.upload_file(path=caminho_audio)
+        try:
+            # Espera o processamento com intervalos crescentes.
+            inicio_espera = time.time()
+            espera = 1.0
+            while audio_file.state.name == "PROCESSING":
+                if time.time() - inicio_espera > self.timeout:
+                    raise TimeoutError(f"Timeout de {self.timeout}s no processamento de '{caminho_audio}'.")
+                time.sleep(espera)
+                espera = min(espera * 1.5, 10.0)
+                audio_file = self.genai.get_file(name=audio_file.name)
+            if audio_file.state.name == "FAILED":
+                raise RuntimeError(f"A API falhou ao processar '{caminho_audio}'.")
+            return self.retry.call(self.modelo.generate_content, [PROMPT_TRANSCRICAO, audio_file]).text
+        finally:
+            try:
+                self.genai.delete_file(audio_file.name)
+            except Exception:
+                pass
+
+
+class TranscritorLocal:
+    """
+    Substituto local para testes: sem rede, devolve uma legenda
+    determinística a cada `intervalo` segundos do trecho.
+    """
+
+    def __init__(self, intervalo: float = 10.0, latencia: float = 0.0):
+        self.intervalo = intervalo
+        self.latencia = latencia
+
+    def transcrever(self, caminho_audio: str, duracao: float) -> str:
+        if self.latencia:
+            time.sleep(self.latencia)
+        nome = os.path.splitext(os.path.basename(caminho_audio))[0]
+        segmentos = []
+        inicio = 0.0
+        while inicio < duracao:
+            fim = min(inicio + self.intervalo, duracao)
+            segmentos.append((inicio, fim, f"[{nome} {inicio:.0f}s-{fim:.0f}s]"))
+            inicio = fim
+        return formatar_srt(segmentos)
+
+
+# --- Orquestração ---
+
+def transcrever_video(caminho_video: str, caminho_srt: str, transcritor, executor: ThreadPoolExecutor,
+                      duracao_trecho: float = DURACAO_TRECHO) -> bool:
+    """
+    Extrai, divide e transcreve o áudio de um vídeo usando o `executor`
+    (que pode ser compartilhado entre vídeos). Devolve False se o vídeo não
+    tem áudio.
+    """
+    if not tem_audio(caminho_video):
+        print(f"AVISO: '{caminho_video}' não possui faixa de áudio. Pulando a transcrição.")
+        return False
+
+    with tempfile.TemporaryDirectory(prefix="transcricao_") as pasta_temp:
+        caminho_audio = os.path.join(pasta_temp, "audio.mp3")
+        extrair_audio(caminho_video, caminho_audio)
+        duracao = duracao_midia(caminho_audio)
+        trechos = dividir_em_trechos(detectar_silencios(caminho_audio), duracao, duracao_trecho, duracao_trecho * 1.5)
+        print(f"INFO: '{caminho_video}': {duracao:.0f}s de áudio em {len(trechos)} trecho(s).")
+
+        def transcrever_trecho(numero, inicio, fim):
+            caminho_trecho = os.path.join(pasta_temp, f"trecho_{numero:03d}.mp3")
+            cortar_audio(caminho_audio, inicio, fim, caminho_trecho)
+            return inicio, fim, transcritor.transcrever(caminho_trecho, fim - inicio)
+
+        futuros = [executor.submit(transcrever_trecho, numero, inicio, fim) for numero, (inicio, fim) in enumerate(trechos)]
+        partes = [futuro.result() for futuro in futuros]
+
+    with open(caminho_srt, "w", encoding="utf-8") as f:
+        f.write(juntar_srt(partes))
+    print(f"INFO: Transcrição salva com sucesso em '{caminho_srt}'.")
+    return True
+
+
+def criar_transcritor(local: bool = False, modelo: str = MODELO_TRANSCRICAO):
+    return TranscritorLocal() if local else TranscritorGemini(modelo)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Transcreve o áudio de vídeos em trechos paralelos e salva um .srt por vídeo.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("videos", nargs="+", help="Arquivos de vídeo.")
+    parser.add_argument("--pasta-saida", default=None, help="Pasta dos .srt (padrão: ao lado de cada vídeo).")
+    parser.add_argument("--paralelo", type=int, default=4, help="Trechos transcritos ao mesmo tempo. Padrão: 4.")
+    parser.add_argument("--duracao-trecho", type=float, default=DURACAO_TRECHO, help="Duração alvo dos trechos (s).")
+    parser.add_argument("--modelo", default=MODELO_TRANSCRICAO, help="Modelo Gemini usado na transcrição.")
+    parser.add_argument("--local", action="store_true", help="Usa o transcritor local (sem rede).")
+    args = parser.parse_args()
+
+    transcritor = criar_transcritor(args.local, args.modelo)
+    falhas = 0
+    with ThreadPoolExecutor(max_workers=args.paralelo) as executor:
+        def processar(caminho_video):
+            pasta = args.pasta_saida or os.path.dirname(caminho_video) or "."
+            os.makedirs(pasta, exist_ok=True)
+            nome = os.path.splitext(os.path.basename(caminho_video))[0]
+            transcrever_video(caminho_video, os.path.join(pasta, f"{nome}.srt"), transcritor, executor, args.duracao_trecho)
+
+        # Cada vídeo é coordenado por uma thread própria; os trechos de todos
+        # eles disputam as `--paralelo` threads do executor.
+        with ThreadPoolExecutor(max_workers=min(len(args.videos), args.paralelo)) as coordenadores:
+            for caminho_video, futuro in zip(args.videos, [coordenadores.submit(processar, v) for v in args.videos]):
+                try:
+                    futuro.result()
+                except Exception as e:
+                    falhas += 1
+                    print(f"ERRO: Falha ao transcrever '{caminho_video}': {e}")
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == "__main__":
+    main()
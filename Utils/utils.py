@@ -1,35 +1,148 @@
+import hashlib
 import json
 import os
+import pickle
 import pandas as pd
 import unicodedata
 
 
-def load_questions(questions_file="BeSim V2.xlsx") -> dict:
-    nome_da_aba = 'perguntas'
-    id_column = 'ID'
-    id_video = 'video ID'
-    question_column = 'pergunta'
-    options_columns = ['resposta A', 'resposta B', 'resposta C', 'resposta D']
-    correct_answer_column = 'reposta correta'
+QUESTIONS_SHEET = 'perguntas'
+QUESTION_COLUMNS = {
+    'id': 'ID',
+    'video': 'video ID',
+    'question': 'pergunta',
+    'options': ['resposta A', 'resposta B', 'resposta C', 'resposta D'],
+    'answer': 'reposta correta',
+}
+VIDEOS_SHEET = 'videos'
+VIDEO_COLUMNS = ['Id', 'link', 'inicio', 'fim']
+DATASET_CACHE_DIR = ".cache"
+DATASET_CACHE_VERSION = 2
+
+
+def _required_columns(df, columns, sheet_name):
+    missing = [column for column in columns if column not in df.columns]
+    if missing:
+        raise ValueError(f"Aba '{sheet_name}' sem as colunas obrigatórias: {', '.join(missing)}.")
+
+
+def _build_questions(df) -> dict:
+    columns = QUESTION_COLUMNS
+    _required_columns(df, [columns['id'], columns['video'], columns['question'], columns['answer'], *columns['options']], QUESTIONS_SHEET)
+    if df[columns['id']].duplicated().any():
+        duplicated = df.loc[df[columns['id']].duplicated(), columns['id']].tolist()
+        print(f"Aviso: IDs de pergunta duplicados na planilha: {duplicated}")
+
     questions = {}
+    rows = zip(
+        df[columns['video']].tolist(),
+        df[columns['id']].tolist(),
+        df[columns['question']].tolist(),
+        df[columns['options']].to_numpy(dtype=object).tolist(),
+        df[columns['answer']].tolist(),
+    )
+    for video_id, id_pergunta, pergunta, opcoes, resposta in rows:
+        questions.setdefault(video_id, {})[id_pergunta] = {
+            'question': pergunta,
+            'options': opcoes,
+            'answer': resposta
+        }
+    return questions
 
+
+def _build_video_table(df, sheet_name=VIDEOS_SHEET) -> dict:
+    _required_columns(df, VIDEO_COLUMNS, sheet_name)
+    observacoes = df['Obs'].tolist() if 'Obs' in df.columns else [None] * len(df)
+    rows = zip(
+        df['Id'].tolist(),
+        df['link'].tolist(),
+        [parse_time_to_seconds(inicio) for inicio in df['inicio'].tolist()],
+        [parse_time_to_seconds(fim) for fim in df['fim'].tolist()],
+        observacoes,
+    )
+    return {
+        video_id: {'url': url, 'start': start, 'end': end, 'Obs': obs}
+        for video_id, url, start, end, obs in rows
+    }
+
+
+def _parse_sheet(workbook, sheet_name, builder):
+    """Monta uma aba; devolve (tabela, erro) para que o erro de uma aba não afete a outra."""
+    if sheet_name not in workbook.sheet_names:
+        return None, f"Worksheet named '{sheet_name}' not found"
     try:
-        df = pd.read_excel(questions_file, sheet_name=nome_da_aba)
-       
-        for indice, linha in df.iterrows():
-            video_id = linha[id_video]
-            id_pergunta = linha[id_column]
-            
-            if video_id not in questions:
-                questions[video_id] = {}
-                
-            questions[video_id][id_pergunta] = {
-                'question': linha[question_column],
-                'options': [linha[col] for col in options_columns],
-                'answer': linha[correct_answer_column]
-            }
-        return questions
+        return builder(workbook.parse(sheet_name)), None
+    except ValueError as e:
+        return None, str(e)
+
+
+def _save_dataset_cache(cache_path, payload):
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    # Grava em um arquivo temporário e renomeia: processos paralelos
+    # nunca leem um cache pela metade.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file:
+        pickle.dump(payload, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
 
+def _load_tables(table_file, videos_sheet=VIDEOS_SHEET, use_cache=True) -> dict:
+    """
+    Lê as abas de perguntas e de vídeos da planilha de uma só vez. Devolve um
+    dict com `questions`, `videos` e `errors` (mensagem por aba que não pôde
+    ser montada).
+
+    O resultado é gravado em um cache binário em `.cache/`. Se o mtime e o
+    tamanho da planilha não mudaram, o cache é usado sem abrir o arquivo; se
+    mudaram mas o conteúdo (hash) é o mesmo, o cache também é aproveitado e
+    passa a guardar o novo mtime e tamanho.
+    """
+    stat = os.stat(table_file)
+    cache_name = hashlib.sha1(f"{os.path.abspath(table_file)}|{videos_sheet}".encode("utf-8")).hexdigest()[:16]
+    cache_path = os.path.join(DATASET_CACHE_DIR, f"dataset_{cache_name}.pkl")
+    table_hash = None
+
+    if use_cache and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as file:
+                cached = pickle.load(file)
+            if cached["version"] == DATASET_CACHE_VERSION:
+                if (cached["mtime_ns"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+                    return cached
+                table_hash = hash_file(table_file)
+                if cached["hash"] == table_hash:
+                    # Ex: a planilha foi copiada ou salva sem mudanças.
+                    cached.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                    _save_dataset_cache(cache_path, cached)
+                    return cached
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError):
+            pass
+
+    with pd.ExcelFile(table_file) as workbook:
+        questions, questions_error = _parse_sheet(workbook, QUESTIONS_SHEET, _build_questions)
+        videos, videos_error = _parse_sheet(workbook, videos_sheet, lambda df: _build_video_table(df, videos_sheet))
+
+    payload = {
+        "version": DATASET_CACHE_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "hash": table_hash or hash_file(table_file),
+        "questions": questions,
+        "videos": videos,
+        "errors": {"questions": questions_error, "videos": videos_error},
+    }
+    if use_cache:
+        _save_dataset_cache(cache_path, payload)
+    return payload
+
+
+def load_questions(questions_file="BeSim V2.xlsx") -> dict:
+    # Só a aba de perguntas é validada: problemas na aba de vídeos não impedem a leitura.
+    try:
+        tables = _load_tables(questions_file)
+        if tables["questions"] is None:
+            raise ValueError(tables["errors"]["questions"])
+        return tables["questions"]
     except FileNotFoundError:
         print(f"Erro: O arquivo '{questions_file}' não foi encontrado.")
     except Exception as e:
@@ -38,27 +151,21 @@ def load_questions(questions_file="BeSim V2.xlsx") -> dict:
 def load_video_table(video_file="BeSim V2.xlsx", sheet_name='videos') -> dict:
     """Carrega a tabela de vídeos do arquivo Excel."""
     try:
-        df = pd.read_excel(video_file, sheet_name=sheet_name)
-        
-        video_table = {}
-        for index, row in df.iterrows():
-            video_table[row['Id']] = {
-                'url': row['link'],
-                'start': parse_time_to_seconds(row['inicio']),
-                'end': parse_time_to_seconds(row['fim']),
-                'Obs': row['Obs'] if 'Obs' in row else None
-            }
-        return video_table
+        tables = _load_tables(video_file, videos_sheet=sheet_name)
+        if tables["videos"] is None:
+            raise ValueError(tables["errors"]["videos"])
+        return tables["videos"]
     except FileNotFoundError:
         print(f"Erro: O arquivo '{video_file}' não foi encontrado.")
     except Exception as e:
         print(f"Ocorreu um erro inesperado: {e}")
 
 
-def createQuestion(question):
+def createQuestion(question, with_instruction=True):
     options_index = ["A", "B", "C", "D"]
     question_text = ""
-    question_text += (f"Selecione a melhor resposta para a seguinte questão de múltipla escolha com base no vídeo. Sua resposta deve conter apenas um caractere com *somente* com a letra ('A', 'B', 'C' ou 'D') da opção correta.\n")
+    if with_instruction:
+        question_text += (f"Selecione a melhor resposta para a seguinte questão de múltipla escolha com base no vídeo. Sua resposta deve conter apenas um caractere com *somente* com a letra ('A', 'B', 'C' ou 'D') da opção correta.\n")
     question_text += (f"Questão: {question['question']}\n")
     question_text += (f"A melhor resposta é:\n")
     for x in range(len(question['options'])):
@@ -67,6 +174,16 @@ def createQuestion(question):
     # question_text += (f"---\n")
     return question_text
 
+def createBatchQuestion(questions: dict) -> str:
+    """Agrupa todas as perguntas de um vídeo em um único prompt, identificadas pelo ID."""
+    question_text = ""
+    question_text += (f"Responda a cada uma das seguintes questões de múltipla escolha com base no vídeo. Para cada questão, a resposta deve ser *somente* a letra ('A', 'B', 'C' ou 'D') da opção correta, junto com o ID da questão.\n\n")
+    for question_id, question in questions.items():
+        question_text += (f"ID: {question_id}\n")
+        question_text += createQuestion(question, with_instruction=False)
+        question_text += "\n"
+    return question_text
+
 def parse_time_to_seconds(time_str: str) -> int:
     """Converte 'HH:MM:SS' para segundos."""
     if(time_str is None or not isinstance(time_str, str)):
@@ -79,6 +196,20 @@ def parse_time_to_seconds(time_str: str) -> int:
     except (ValueError, IndexError):
         raise ValueError(f"Formato de timestamp inválido: '{time_str}'. Use 'HH:MM:SS'.")
 
+_file_hashes = {}
+
+def hash_file(path: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 do conteúdo de um arquivo, memorizado por caminho, tamanho e mtime."""
+    stat = os.stat(path)
+    cache_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if cache_key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(chunk_size), b""):
+                digest.update(chunk)
+        _file_hashes[cache_key] = digest.hexdigest()
+    return _file_hashes[cache_key]
+
 def saveResponses(responses, output_file="responses/responses_model.xlsx"):
     df = pd.DataFrame(responses)
 